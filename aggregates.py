@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from rules import RULES
+
+# Grade bands as (name, lowest score in the band), in ascending order. The first
+# band takes every score below the second band
+DEFAULT_GRADE_BANDS = [
+    ("Fail", 0),
+    ("Pass", 40),
+    ("2.2", 50),
+    ("2.1", 60),
+    ("1st", 70),
+]
+
+# Scores this close below a band boundary are counted as borderline
+DEFAULT_BORDERLINE_WIDTH = 2
+
+DEFAULT_MAX_SCORE = 100
+
+
+class GradeBands:
+    """
+    Grade bands and their borderline ranges, compiled once into sorted bin edges.
+
+    count() puts every score in its bin in a single pass and adds the bins up
+    into one row per band, with a borderline row before each band boundary:
+    Fail (<40), Borderline fail (38 - 40), Pass (40 - 50), ... 1st (70 - 100).
+    The top band includes the maximum score.
+    """
+
+    def __init__(self, bands=None, borderline_width=DEFAULT_BORDERLINE_WIDTH, max_score=DEFAULT_MAX_SCORE):
+        bands = list(bands or DEFAULT_GRADE_BANDS)
+        lowers = [x[1] for x in bands]
+        if lowers != sorted(set(lowers)) or lowers[-1] >= max_score:
+            raise ValueError("Grade bands must be in ascending order of lowest score, below the maximum score")
+
+        boundaries = lowers[1:]
+        borderlines = [x - borderline_width for x in boundaries]
+        if borderline_width < 0 or any(x < y for x, y in zip(borderlines, lowers)):
+            raise ValueError("The borderline width must fit inside every band")
+
+        # The top edge is nudged up so the maximum score falls in the top band
+        self.edges = np.unique(borderlines + boundaries + [np.nextafter(max_score, np.inf)])
+
+        # Each row of the table is a run of consecutive bins, start inclusive and stop exclusive
+        self.rows = []
+        for i, (name, lower) in enumerate(bands):
+            upper = boundaries[i] if i < len(boundaries) else max_score
+            if i == 0:
+                self.rows.append((f"{name} (<{upper})", 0, self._bin(upper)))
+            else:
+                self.rows.append((f"{name} ({lower} - {upper})", self._bin(lower), self._bin(upper if i < len(boundaries) else self.edges[-1])))
+
+            if i < len(boundaries):
+                above = bands[i + 1][0]
+                label = f"Borderline {name.lower()}" if i == 0 else f"Borderline {name.lower()}/{above}"
+                self.rows.append((f"{label} ({borderlines[i]} - {upper})", self._bin(borderlines[i]), self._bin(upper)))
+
+    def _bin(self, edge):
+        # Bin i holds scores from edges[i - 1] up to, not including, edges[i]
+        return int(np.searchsorted(self.edges, edge)) + 1
+
+    def count(self, scores):
+        """
+        Counts the scores in every band and borderline range.
+
+        Returns:
+            DataFrame: 'Score Range' and 'Submissions' columns, one row per band and borderline range.
+        """
+        scores = pd.to_numeric(pd.Series(scores), errors="coerce").dropna().to_numpy(dtype=float)
+        bins = np.bincount(np.searchsorted(self.edges, scores, side="right"), minlength=len(self.edges) + 1)
+        totals = np.concatenate([[0], np.cumsum(bins)])
+
+        return pd.DataFrame(
+            [(label, int(totals[stop] - totals[start])) for label, start, stop in self.rows],
+            columns=["Score Range", "Submissions"])
+
+
+def count_issues(flags, rules):
+    """
+    Counts the submissions impacted by each moderation rule in a single pass over the flags.
+
+    Returns:
+        DataFrame: 'Moderation Issue' and 'Submissions Impacted' columns, one row
+        per rule and a final 'Total' row of submissions with any issue.
+    """
+    flags = np.asarray(flags, dtype=np.int64)
+    counts = ((flags[:, None] >> np.arange(len(rules))) & 1).sum(axis=0)
+
+    rows = [(rule.description, int(count)) for rule, count in zip(rules, counts)]
+    rows.append(("Total", int(np.count_nonzero(flags))))
+    return pd.DataFrame(rows, columns=["Moderation Issue", "Submissions Impacted"])
+
+
+def summary_tables(df, grade_bands=None, rules=RULES):
+    """
+    Computes the aggregates shared by the moderated report and its summary.
+
+    Returns:
+        dict: 'Score bands' and 'Moderation issues' data frames.
+    """
+    if grade_bands is None:
+        grade_bands = GradeBands()
+
+    return {
+        "Score bands": grade_bands.count(df["score"]),
+        "Moderation issues": count_issues(df["moderation_flags"], rules),
+    }
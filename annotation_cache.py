@@ -0,0 +1,182 @@
+import json
+import sqlite3
+import threading
+import time
+
+from tracing import tracer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    attempt INTEGER,
+    graded_at TEXT,
+    annotations TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (course_id, assignment_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS annotation_failures (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    attempt INTEGER,
+    graded_at TEXT,
+    failures INTEGER NOT NULL,
+    error TEXT,
+    failed_at REAL NOT NULL,
+    retry_after REAL NOT NULL,
+    PRIMARY KEY (course_id, assignment_id, user_id)
+);
+"""
+
+
+class AnnotationCache:
+    """
+    Scraped annotations kept on disk, so they are only scraped once per version of a submission.
+
+    Annotations are stored by course, assignment and student along with the
+    submission's attempt and graded_at, and reused until either changes. Every
+    scrape is committed as soon as it finishes, so a run that stops part way,
+    e.g. when a browser crashes, keeps everything scraped so far.
+
+    Failed scrapes are recorded apart from the annotations, with how many times
+    they have failed. A failed submission isn't tried again until its backoff
+    has passed, backoff seconds doubling with every failure up to max_backoff.
+    """
+
+    def __init__(self, path, course_id, assignment_id, backoff=60, max_backoff=24 * 60 * 60):
+        self.path = path
+        self.course_id = course_id
+        self.assignment_id = assignment_id
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hits = 0
+        self.scraped = 0
+        self.failed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        # Rows are built on worker threads. A batch can run the same assignment
+        # in another process, so wait for its writes rather than fail
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def _key(self, submission):
+        return (self.course_id, self.assignment_id, submission.user_id)
+
+    @staticmethod
+    def _version(submission):
+        return (getattr(submission, "attempt", None), getattr(submission, "graded_at", None))
+
+    def get(self, submission):
+        """
+        Returns:
+            list: The cached annotations for this version of the submission, or None if there are none.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT attempt, graded_at, annotations FROM annotations WHERE course_id = ? AND assignment_id = ? AND user_id = ?",
+                self._key(submission)).fetchone()
+
+        if row is None or tuple(row[:2]) != self._version(submission):
+            return None
+        return json.loads(row[2])
+
+    def put(self, submission, annotations):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._key(submission) + self._version(submission) + (json.dumps(annotations), time.time()))
+            self.db.execute(
+                "DELETE FROM annotation_failures WHERE course_id = ? AND assignment_id = ? AND user_id = ?",
+                self._key(submission))
+
+    def failure(self, submission):
+        """
+        Returns:
+            tuple: The number of failures and the time to retry after, for this
+            version of the submission, or None if it hasn't failed.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT attempt, graded_at, failures, retry_after FROM annotation_failures "
+                "WHERE course_id = ? AND assignment_id = ? AND user_id = ?",
+                self._key(submission)).fetchone()
+
+        # A new attempt or regrade starts afresh
+        if row is None or tuple(row[:2]) != self._version(submission):
+            return None
+        return row[2], row[3]
+
+    def record_failure(self, submission, error):
+        previous = self.failure(submission)
+        failures = previous[0] + 1 if previous else 1
+        now = time.time()
+        retry_after = now + min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO annotation_failures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._key(submission) + self._version(submission) + (failures, str(error), now, retry_after))
+
+    def _count(self, name):
+        # Scrapes are counted from worker threads
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get_annotations(self, session, submission, url):
+        """
+        Returns the submission's cached annotations, scraping them with session if they
+        aren't cached. A failed scrape, or one still backing off, gives no annotations.
+        """
+        from annotations import ScrapeFailed, fetch_annotations
+
+        cached = self.get(submission)
+        if cached is not None:
+            self._count("hits")
+            tracer.count("annotation_cache_hits")
+            return cached
+
+        failure = self.failure(submission)
+        if failure is not None and time.time() < failure[1]:
+            self._count("skipped")
+            tracer.count("annotation_backoff_skips")
+            return []
+
+        try:
+            annotations = fetch_annotations(session, url)
+        except ScrapeFailed as e:
+            self._count("failed")
+            self.record_failure(submission, e)
+            return []
+
+        self._count("scraped")
+        self.put(submission, annotations)
+        return annotations
+
+    def pending(self, submission):
+        """
+        Whether the submission's annotations still have to be scraped, after a failure.
+        """
+        return self.failure(submission) is not None
+
+    def retries_due(self):
+        """
+        Whether any failed scrape has waited out its backoff. An incremental sync
+        only fetches submissions that changed, so it won't see these by itself.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM annotation_failures WHERE course_id = ? AND assignment_id = ? AND retry_after <= ? LIMIT 1",
+                (self.course_id, self.assignment_id, time.time())).fetchone()
+        return row is not None
+
+    def summary(self):
+        with self._lock:
+            return f"Annotations: {self.hits} cached, {self.scraped} scraped, {self.failed} failed, {self.skipped} waiting to retry"
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -1,56 +1,383 @@
 from utils import CanvasSession
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from canvasapi import Canvas
 from config import *
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlsplit, parse_qs
+import json
+import queue
+import re
+import requests
+import statistics
+import threading
 import time
 import pickle
 
+from tracing import tracer
+
 # import beautifulsoup
 from bs4 import BeautifulSoup
 
+ANNOTATION_SELECTOR = "div.ScreenreaderAnnotation-root-comment"
+
+# DocViewer renders the document pages whether or not they carry annotations.
+# Once they are showing with no annotation nodes the submission has none.
+DOCUMENT_READY_SELECTOR = "div.Page, [class*='ScreenreaderAnnotations']"
+
+
+class RenderTimes:
+    """
+    Observed annotation render times, shared by every browser.
+
+    The wait for a submission's annotations is sized from what has been seen
+    so far: factor times the 95th percentile render time, kept between
+    min_timeout and max_timeout. Until enough renders have been seen the
+    initial timeout is used. A render that times out counts as taking the
+    whole timeout, so slow documents push the timeout back up. The full
+    per-submission latency is also kept so the run can report its p50/p95.
+    """
+
+    def __init__(self, initial_timeout=15, min_timeout=5, max_timeout=60, factor=2.0, min_samples=5):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.factor = factor
+        self.min_samples = min_samples
+        self.renders = []
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def timeout(self):
+        with self._lock:
+            renders = list(self.renders)
+
+        if len(renders) < self.min_samples:
+            return self.initial_timeout
+
+        p95 = statistics.quantiles(renders, n=20)[-1]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.factor))
+
+    def record_render(self, seconds):
+        with self._lock:
+            self.renders.append(seconds)
+
+    def record_timeout(self, seconds):
+        # All that is known is that the render took longer than this
+        self.record_render(seconds)
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            latencies = list(self.latencies)
+
+        if not latencies:
+            return {"count": 0, "p50": None, "p95": None}
+
+        if len(latencies) == 1:
+            return {"count": 1, "p50": latencies[0], "p95": latencies[0]}
+
+        return {
+            "count": len(latencies),
+            "p50": statistics.median(latencies),
+            "p95": statistics.quantiles(latencies, n=20)[-1],
+        }
+
+
+render_times = RenderTimes()
+
+
+class ScrapeFailed(Exception):
+    """
+    A submission's annotations couldn't be read, as opposed to it having none.
+    """
+
+
+class _AnnotationsReady:
+    """
+    Wait condition for the SpeedGrader iframe. Annotations are ready once the
+    document is showing and their count, none included, hasn't changed for
+    settle seconds, in case more are still on their way.
+    """
+
+    def __init__(self, settle=1.0):
+        self.settle = settle
+        self.last_count = None
+        self.stable_since = None
+
+    def __call__(self, browser):
+        count = len(browser.find_elements(By.CSS_SELECTOR, ANNOTATION_SELECTOR))
+
+        if not count and not browser.find_elements(By.CSS_SELECTOR, DOCUMENT_READY_SELECTOR):
+            self.last_count = None
+            return False
+
+        if count != self.last_count:
+            self.last_count = count
+            self.stable_since = time.time()
+            return False
+
+        return time.time() - self.stable_since >= self.settle
+
+
 def get_urls(submissions):
     return [f"{CANVAS_URL}/courses/{course_id}/gradebook/speed_grader?assignment_id={assignment_id}&student_id={x.user_id}" for x in submissions]
 
 
+class BrowserPool:
+    """
+    A pool of browsers that share one authenticated Canvas login.
+
+    The first browser is the session that went through login and DUO, the rest
+    are opened with a copy of its cookies. Each scrape checks out an idle browser,
+    so up to size submissions are scraped at once. A browser that crashes or
+    hangs past page_load_timeout is thrown away and replaced, and the submission
+    is retried on the new browser. If the replacement can't be started the pool
+    runs a browser short, and starts it again the next time every other browser
+    is busy.
+    """
+
+    def __init__(self, session, size=1, page_load_timeout=120, retries=1):
+        self.session = session
+        self.page_load_timeout = page_load_timeout
+        self.retries = retries
+        self.size = size
+        self._idle = queue.Queue()
+        self._missing = 0
+        self._lock = threading.Lock()
+
+        with session.lock:
+            self.cookies = session.get_cookies()
+
+        self._add(session)
+        for i in range(size - 1):
+            self._add(self._start())
+
+    def _add(self, session):
+        session.browser.set_page_load_timeout(self.page_load_timeout)
+        self._idle.put(session)
+
+    def _start(self):
+        session = CanvasSession(cookies=self.cookies, base_url=self.session.base_url)
+        session.browser.set_page_load_timeout(self.page_load_timeout)
+        return session
+
+    def _restart(self, reason):
+        # Only called for a browser that is already out of the pool
+        try:
+            return self._start()
+        except Exception as e:
+            with self._lock:
+                self._missing += 1
+            raise ScrapeFailed(f"{reason}, and a new browser couldn't be started: {e}") from e
+
+    def _checkout(self):
+        with self._lock:
+            restart = self._missing > 0 and self._idle.empty()
+            if restart:
+                self._missing -= 1
+
+        if restart:
+            return self._restart("A browser was lost")
+        return self._idle.get()
+
+    def get_annotations(self, url):
+        session = self._checkout()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return _scrape_annotations(session, url)
+                except WebDriverException as e:
+                    print(f"Browser failed while scraping {url}, restarting it")
+                    tracer.count("browser_restarts")
+                    error = e
+
+                    # The failed browser never goes back to the pool, even if it can't be replaced
+                    try:
+                        session.close()
+                    except WebDriverException:
+                        pass
+                    session = None
+                    session = self._restart(f"Browser failed while scraping {url}")
+            raise ScrapeFailed(f"Browser failed {self.retries + 1} times: {error}")
+        finally:
+            if session is not None:
+                self._idle.put(session)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+
+class HttpAnnotationClient:
+    """
+    Fetches annotations over HTTP without rendering SpeedGrader.
+
+    The submission's attachments are read from the Canvas API. Each attachment's
+    preview_url redirects to a DocViewer session, and the annotations are read
+    from that session's annotations endpoint. Requests carry the cookies of a
+    logged-in CanvasSession on a pooled requests.Session, so the browser is only
+    needed to log in. Pass a stub_server.Cassette to record the responses.
+    """
+
+    def __init__(self, cookies, base_url, pool_size=10, timeout=60, cassette=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+        for cookie in cookies:
+            self.http.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+
+        if cassette is not None:
+            self.http.hooks["response"].append(cassette.record)
+
+        tracer.attach(self.http, prefix="annotation_http")
+
+    def _get_json(self, url):
+        response = self.http.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        # Canvas prefixes JSON returned to cookie-authenticated requests with while(1);
+        return json.loads(response.text.removeprefix("while(1);"))
+
+    def get_annotations(self, url):
+        # The SpeedGrader url identifies the course, assignment and student
+        parts = urlsplit(url)
+        course_id = re.search(r"/courses/(\d+)", parts.path).group(1)
+        query = parse_qs(parts.query)
+        assignment_id = query["assignment_id"][0]
+        user_id = query["student_id"][0]
+
+        annotations = []
+        try:
+            submission = self._get_json(f"{self.base_url}/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions/{user_id}")
+
+            for attachment in submission.get("attachments", []):
+                if not attachment.get("preview_url"):
+                    continue
+
+                # Follow the redirect to the DocViewer session for this attachment
+                viewer = self.http.get(urljoin(self.base_url, attachment["preview_url"]), timeout=self.timeout)
+                viewer.raise_for_status()
+                session_url = viewer.url.split("/view")[0]
+
+                data = self._get_json(f"{session_url}/annotations")
+                annotations += parse_docviewer_annotations(data)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Failed to fetch annotations for {url}: {e}")
+            raise ScrapeFailed(str(e)) from e
+
+        return annotations
+
+    def close(self):
+        self.http.close()
+
+
+def parse_docviewer_annotations(data):
+    """
+    Converts a DocViewer annotations payload to the comment dicts returned by get_annotations.
+
+    Only annotations with written contents are kept, matching the comments
+    SpeedGrader lists for screen readers.
+    """
+    if isinstance(data, dict):
+        data = data.get("data", [])
+
+    annotations = []
+    for item in data:
+        contents = (item.get("contents") or "").strip()
+        if not contents:
+            continue
+
+        annotations.append({
+            "author": item.get("user_name") or "",
+            "comment": contents,
+            "type": "annotation"
+        })
+
+    return annotations
+
+
+def parse_speedgrader_annotations(html_string):
+    """
+    Reads the comment dicts returned by get_annotations from the screen reader
+    annotation list of a rendered DocViewer document.
+    """
+    annotations = []
+
+    soup = BeautifulSoup(html_string, 'html.parser')
+    annotation_authors = soup.find_all('div', {'class': 'ScreenreaderAnnotation-author'})
+    annotation_comments = soup.find_all('div', {'class': 'ScreenreaderAnnotation-root-comment'})
+
+    for author, annotation in zip(annotation_authors, annotation_comments):
+        comment = {
+            "author": author.get_text().split(":")[-1].strip(),
+            "comment": annotation.get_text().split(":")[-1].strip(),
+            "type": "annotation"
+        }
+
+        annotations.append(comment)
+
+    return annotations
+
+
 # This function gets the annotations
 def get_annotations(session, url):
+    try:
+        return fetch_annotations(session, url)
+    except ScrapeFailed:
+        return []
 
-    session.browser.get(url)
-    wait = 0
-    while True:
 
-        try:
-            session.browser.switch_to.frame('speedgrader_iframe')
+def fetch_annotations(session, url):
+    """
+    Like get_annotations, but raises ScrapeFailed if the annotations couldn't be read.
+    """
+    if isinstance(session, (BrowserPool, HttpAnnotationClient)):
+        return session.get_annotations(url)
 
-            time.sleep(15)
+    with session.lock:
+        return _scrape_annotations(session, url)
 
-            annotations = []
 
-            html_string = session.browser.page_source
-            soup = BeautifulSoup(html_string, 'html.parser')
-            annotation_authors = soup.find_all('div', {'class': 'ScreenreaderAnnotation-author'})
-            annotation_comments = soup.find_all('div', {'class': 'ScreenreaderAnnotation-root-comment'})
+def _scrape_annotations(session, url):
+    started = time.time()
+    timeout = render_times.timeout()
 
-            for author, annotation in zip(annotation_authors, annotation_comments):
-                comment = {
-                    "author": author.get_text().split(":")[-1],
-                    "comment": annotation.get_text().split(":")[-1],
-                    "type": "annotation"
-                }
+    with tracer.span("speedgrader_load"):
+        session.browser.get(url)
 
-                annotations.append(comment)
-                  
-            session.browser.switch_to.default_content()
+    try:
+        with tracer.span("speedgrader_frame_wait"):
+            WebDriverWait(session.browser, timeout).until(EC.frame_to_be_available_and_switch_to_it('speedgrader_iframe'))
+    except TimeoutException:
+        tracer.count("annotation_timeouts")
+        raise ScrapeFailed(f"SpeedGrader didn't load within {timeout:.0f}s")
+
+    try:
+        frame_loaded = time.time()
+        try:
+            with tracer.span("annotation_render_wait"):
+                WebDriverWait(session.browser, timeout, poll_frequency=0.25).until(_AnnotationsReady())
+            render_times.record_render(time.time() - frame_loaded)
+        except TimeoutException:
+            # Whatever has rendered so far may be missing annotations
+            tracer.count("annotation_timeouts")
+            render_times.record_timeout(timeout)
+            raise ScrapeFailed(f"Annotations didn't finish rendering within {timeout:.0f}s")
 
-            break
-        except:
-            if wait > 20:
-                annotations = []
-                break
-            else:
-                time.sleep(2)
-                wait += 2
-                continue
+        annotations = parse_speedgrader_annotations(session.browser.page_source)
+    finally:
+        session.browser.switch_to.default_content()
 
-    return annotations    
+    render_times.record_latency(time.time() - started)
 
+    return annotations
@@ -0,0 +1,144 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from canvasapi import Canvas
+import argparse
+import csv
+import datetime
+import getpass
+import time
+
+import pandas as pd
+
+from moderation import moderate
+from report import fetch_report, open_annotation_session, get_grader_directory, get_session_cache_path
+from utils import CanvasSession, saved_session
+
+TRUE_VALUES = ["y", "yes", "true", "1"]
+
+
+def read_manifest(path, annotations=False, anonymise=False, summary=False):
+    """
+    Reads a CSV manifest of assignments to moderate.
+
+    The manifest needs course_id and assignment_id columns. Optional annotations,
+    anonymise and summary columns (y/n) override the command line options for
+    that assignment.
+    """
+    jobs = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            jobs.append({
+                "course_id": int(row["course_id"]),
+                "assignment_id": int(row["assignment_id"]),
+                "annotations": _option(row, "annotations", annotations),
+                "anonymise": _option(row, "anonymise", anonymise),
+                "summary": _option(row, "summary", summary),
+            })
+    return jobs
+
+
+def _option(row, name, default):
+    value = (row.get(name) or "").strip().lower()
+    if not value:
+        return default
+    return value in TRUE_VALUES
+
+
+def run_job(job, CANVAS_URL, CANVAS_TOKEN, cookies=None, plots=None):
+    """
+    Fetches and moderates one assignment. Runs in a worker process.
+    """
+    started = time.time()
+    result = {"course_id": job["course_id"], "assignment_id": job["assignment_id"], "status": "ok", "report": ""}
+
+    try:
+        canvas = Canvas(CANVAS_URL, CANVAS_TOKEN)
+
+        session = None
+        if job["annotations"]:
+            session = open_annotation_session(CANVAS_URL, cookies=cookies)
+
+        report_path = fetch_report(canvas, CANVAS_URL, job["course_id"], job["assignment_id"], annotations=job["annotations"], session=session)
+        # Assignments already run in parallel, so criteria are analysed and charts drawn in this process
+        moderate(report_path, anonymise_graders=job["anonymise"], generate_summary=job["summary"], processes=1, plots=plots)
+        result["report"] = report_path
+    except Exception as e:
+        result["status"] = f"failed: {e}"
+
+    result["seconds"] = round(time.time() - started, 1)
+    return result
+
+
+def run_batch(jobs, CANVAS_URL, CANVAS_TOKEN, processes=4, cookies=None, plots=None):
+    """
+    Moderates every assignment in jobs across a process pool.
+
+    Returns:
+        DataFrame: One row per assignment with its status, report path and timing.
+    """
+    # Load each course's graders once up front, the workers then share the on-disk
+    # cache. With the cache disabled every worker looks its graders up itself
+    canvas = Canvas(CANVAS_URL, CANVAS_TOKEN)
+    for course_id in sorted({x["course_id"] for x in jobs}):
+        graders = get_grader_directory(canvas, course_id)
+        if graders.cache_path is None:
+            break
+        graders.load()
+        graders.save()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_job, job, CANVAS_URL, CANVAS_TOKEN, cookies, plots) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"{result['course_id']}/{result['assignment_id']}: {result['status']} ({result['seconds']}s)")
+            results.append(result)
+
+    # Report in manifest order
+    order = {(x["course_id"], x["assignment_id"]): i for i, x in enumerate(jobs)}
+    results.sort(key=lambda x: order[(x["course_id"], x["assignment_id"])])
+    return pd.DataFrame(results, columns=["course_id", "assignment_id", "status", "seconds", "report"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderate many Canvas assignments without prompting.")
+    parser.add_argument("manifest", help="CSV file with course_id and assignment_id columns")
+    parser.add_argument("--processes", type=int, default=4, help="Number of assignments to moderate at once")
+    parser.add_argument("--annotations", action="store_true", help="Scrape submission annotations")
+    parser.add_argument("--anonymise", action="store_true", help="Anonymise graders")
+    parser.add_argument("--summary", action="store_true", help="Generate a moderation summary for each assignment")
+    parser.add_argument("--no-plots", action="store_true", help="Skip the boxplots for a faster, statistics only run")
+    parser.add_argument("--status", default=None, help="Where to save the status table (.csv)")
+    args = parser.parse_args()
+
+    # if config.py exists, import it
+    try:
+        from config import CANVAS_URL, CANVAS_TOKEN
+    except ImportError:
+        CANVAS_URL = input('Enter your Canvas URL: ')
+        CANVAS_TOKEN = getpass.getpass('Enter your Canvas token: ')
+
+    jobs = read_manifest(args.manifest, annotations=args.annotations, anonymise=args.anonymise, summary=args.summary)
+
+    # Log in once, every worker's browser reuses the cookies. A saved login is
+    # reused without opening a browser, so unattended batches can scrape
+    cookies = None
+    if any(x["annotations"] for x in jobs):
+        cache_path = get_session_cache_path()
+        cookies = saved_session(cache_path, CANVAS_URL) if cache_path else None
+        if cookies is None:
+            session = CanvasSession(cache_path=cache_path, base_url=CANVAS_URL)
+            cookies = session.get_cookies()
+            session.close()
+
+    status = run_batch(jobs, CANVAS_URL, CANVAS_TOKEN, processes=args.processes, cookies=cookies, plots=False if args.no_plots else None)
+
+    print("")
+    print(status.to_string(index=False))
+
+    status_path = args.status or f"batch_status_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv"
+    status.to_csv(status_path, index=False)
+    print(f"Status table saved as {status_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Fetch benchmark against a local Canvas stand-in.
+
+Serves a synthetic cohort from stub_server.py with the given latency, page
+size and rate limit, then fetches and builds its report through canvasapi
+once for each number of workers, counting the requests made:
+
+    python benchmarks/fetch.py --scale 2000x40 --latency 0.05 --per-page 50 --workers 1 4 8 --rate-limit 700
+
+With --stream, rows are built from each page as it arrives instead of after
+every submission has been fetched. --tracemalloc records how much memory is
+held at the peak, which slows the runs down.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run(server, bucket, course_id, assignment_id, workers, stream=False, trace=False, backend="rest"):
+    """
+    Fetches and builds one report from the stand-in in a scratch directory.
+
+    Returns:
+        dict: Timings and request counts for the run.
+    """
+    from canvasapi import Canvas
+
+    import report
+    from graders import GraderDirectory
+
+    server.requests.clear()
+    throttled = bucket.throttled if bucket else 0
+    canvas = Canvas(server.url, "synthetic-token")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        if trace:
+            tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            graders = GraderDirectory(canvas, course_id)
+            submissions = report.get_submissions(canvas, course_id, assignment_id, stream=stream, backend=backend, graders=graders)
+            rubric = report.get_rubric(canvas, course_id, assignment_id, backend=backend)
+            fetched = time.perf_counter()
+
+            header_list = report.get_headers(rubric, False)
+            report.build_report(canvas, course_id, assignment_id, header_list, submissions, rubric, server.url, graders=graders, workers=workers)
+            finished = time.perf_counter()
+            peak = tracemalloc.get_traced_memory()[1] if trace else None
+        finally:
+            if trace:
+                tracemalloc.stop()
+            os.chdir(cwd)
+
+    result = {
+        "workers": workers,
+        "fetch_seconds": round(fetched - started, 3),
+        "build_seconds": round(finished - fetched, 3),
+        "requests": sum(server.requests.values()),
+        "throttled": (bucket.throttled if bucket else 0) - throttled,
+    }
+    if trace:
+        result["traced_peak_mb"] = round(peak / (1024 * 1024), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time fetching a report from a local Canvas stand-in.")
+    parser.add_argument("--scale", default="1000x20", help="Cohort size as STUDENTSxGRADERS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many more seconds added at random")
+    parser.add_argument("--per-page", type=int, default=100, help="Largest page the stand-in serves")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Size of the rate limit bucket. Unlimited if not given")
+    parser.add_argument("--leak-rate", type=float, default=10, help="Rate limit units the bucket drains a second")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Numbers of workers to compare")
+    parser.add_argument("--stream", action="store_true", help="Build rows from each page of submissions as it arrives")
+    parser.add_argument("--backend", choices=["rest", "graphql"], default="rest", help="Where submissions are fetched from")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also record the peak Python allocations. Slows the runs down")
+    args = parser.parse_args()
+
+    from stub_server import LeakyBucket, StubServer, SyntheticAPI
+    from synthetic import SyntheticCohort
+
+    students, graders = [int(x) for x in args.scale.lower().split("x")]
+    cohort = SyntheticCohort(students=students, graders=graders, seed=args.seed)
+    api = SyntheticAPI(cohort, max_per_page=args.per_page)
+
+    print(f"{'workers':>7} {'fetch':>9} {'build':>9} {'requests':>9} {'throttled':>9}" + (f" {'traced':>9}" if args.tracemalloc else ""))
+    for workers in args.workers:
+        # A fresh bucket for every run
+        bucket = LeakyBucket(args.rate_limit, args.leak_rate) if args.rate_limit else None
+        with StubServer(api=api, latency=args.latency, jitter=args.jitter, bucket=bucket) as server:
+            result = run(server, bucket, cohort.course["id"], cohort.assignment["id"], workers, args.stream, args.tracemalloc, args.backend)
+        print(f"{result['workers']:>7} {result['fetch_seconds']:>8.2f}s {result['build_seconds']:>8.2f}s {result['requests']:>9} {result['throttled']:>9}" + (f" {result['traced_peak_mb']:>6.1f} MB" if args.tracemalloc else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Report and moderation pipeline benchmark on synthetic cohorts.
+
+Builds a report for each cohort size from a SyntheticCohort, without a live
+Canvas course, then moderates and summarises it, timing every stage and
+recording peak memory. Results are saved as JSON so runs can be compared:
+
+    python benchmarks/pipeline.py --scale 100x5 1000x20 10000x100 --output before.json
+    python benchmarks/pipeline.py --scale 100x5 1000x20 10000x100 --compare before.json
+
+A scale is STUDENTSxGRADERS, e.g. 50000x300.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# resource is Unix only, psutil is used instead where it is installed
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ["build_report", "load_report", "grader_analysis", "moderate", "plots", "summary"]
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, or None where it can't be read.
+    """
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    # Windows keeps the peak working set, elsewhere only the current RSS is known
+    memory = psutil.Process().memory_info()
+    return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1)
+
+
+def measure(stage, fn, trace=False):
+    """
+    Runs one stage, returning its result and a row of timings.
+    """
+    if trace:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    result = fn()
+    row = {"stage": stage, "seconds": round(time.perf_counter() - started, 3), "peak_rss_mb": peak_rss_mb()}
+
+    if trace:
+        row["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    return result, row
+
+
+def run_scale(students, graders, criteria=5, seed=0, processes=1, trace=False, stages=STAGES):
+    """
+    Runs the pipeline on one synthetic cohort in a scratch directory.
+
+    Returns:
+        list: One row of timings per stage.
+    """
+    import moderation
+    import report
+    import summary
+    from graders import GraderDirectory
+    from plots import boxplot_path, render_grader_boxplot
+    from synthetic import SyntheticCanvas, SyntheticCohort
+
+    cohort = SyntheticCohort(students=students, graders=graders, criteria=criteria, seed=seed)
+    canvas = SyntheticCanvas(cohort)
+    course_id, assignment_id = cohort.course["id"], cohort.assignment["id"]
+
+    rows = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        # Reports are written relative to the working directory
+        os.chdir(scratch)
+        try:
+            def build():
+                submissions = report.get_submissions(canvas, course_id, assignment_id)
+                rubric = report.get_rubric(canvas, course_id, assignment_id)
+                header_list = report.get_headers(rubric, False)
+                return report.build_report(canvas, course_id, assignment_id, header_list, submissions, rubric, "https://canvas.invalid", graders=GraderDirectory(canvas, course_id))
+
+            fpath, row = measure("build_report", build, trace)
+            rows.append(row)
+
+            loaded = {}
+
+            def load():
+                loaded["df"] = moderation.count_total_words(moderation.load_report(fpath))
+
+            def frame():
+                if "df" not in loaded:
+                    load()
+                return loaded["df"]
+
+            def statistics():
+                return [moderation.grader_statistics(frame(), x) for x in ["score", "total_words"]]
+
+            def plots():
+                df = frame()
+                for label in ["score", "total_words"]:
+                    data = df[df[label].notnull()]
+                    results_df = moderation.grader_statistics(data, label)
+                    render_grader_boxplot(data[[label, "grader"]], label, list(results_df["Grader"]), list(results_df["P-Value"] < 0.05), data[label].median(), boxplot_path(fpath, label))
+
+            stage_functions = {
+                "load_report": load,
+                "grader_analysis": statistics,
+                "moderate": lambda: moderation.moderate(fpath, processes=processes, plots=False),
+                "plots": plots,
+                "summary": lambda: summary.summarise(fpath),
+            }
+
+            for stage in stages:
+                if stage == "build_report":
+                    continue
+                _, row = measure(stage, stage_functions[stage], trace)
+                rows.append(row)
+        finally:
+            os.chdir(cwd)
+
+    for row in rows:
+        row.update({"students": students, "graders": graders, "canvas_requests": canvas.requests})
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_scale(scale):
+    students, graders = scale.lower().split("x")
+    return int(students), int(graders)
+
+
+def compare(results, baseline):
+    """
+    Prints each stage's time against the same stage and scale in the baseline.
+    """
+    before = {(x["students"], x["graders"], x["stage"]): x for x in baseline["results"]}
+    print(f"{'scale':<12} {'stage':<16} {'before':>9} {'after':>9} {'change':>8}")
+    for row in results:
+        key = (row["students"], row["graders"], row["stage"])
+        if key not in before:
+            continue
+        old = before[key]["seconds"]
+        change = f"{(row['seconds'] - old) / old * 100:+.0f}%" if old else ""
+        print(f"{row['students']}x{row['graders']:<7} {row['stage']:<16} {old:>8.3f}s {row['seconds']:>8.3f}s {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the report and moderation pipeline on synthetic cohorts.")
+    parser.add_argument("--scale", nargs="+", default=["100x5", "1000x20", "10000x100"], help="Cohort sizes as STUDENTSxGRADERS")
+    parser.add_argument("--criteria", type=int, default=5, help="Rubric criteria per assignment")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1, help="Processes used by moderate, 1 runs it in this process")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, help="Stages to run, build_report always runs")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also record each stage's peak Python allocations. Slows the stages down")
+    parser.add_argument("--output", default="pipeline_results.json", help="Where to save the results")
+    parser.add_argument("--compare", default=None, help="A results file to compare this run with")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scale:
+        students, graders = parse_scale(scale)
+        print(f"Cohort of {students} students and {graders} graders...")
+        # Each cohort runs in a fresh process, so its peak memory isn't left over from the last one
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            rows = executor.submit(run_scale, students, graders, args.criteria, args.seed, args.processes, args.tracemalloc, args.stages).result()
+        for row in rows:
+            rss = "" if row['peak_rss_mb'] is None else f"  peak RSS {row['peak_rss_mb']} MB"
+            print(f"  {row['stage']:<16} {row['seconds']:>8.3f}s{rss}" + (f", traced {row['traced_peak_mb']} MB" if "traced_peak_mb" in row else ""))
+        results += rows
+
+    output = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "criteria": args.criteria,
+        "seed": args.seed,
+        "processes": args.processes,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results saved as {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Startup time benchmark.
+
+Times `import main` and `main.py <command> --help` in fresh interpreters, and
+checks that none of the heavy modules are imported before a command runs.
+Exits with status 1 if a budget is exceeded or a heavy module is imported.
+
+    python benchmarks/startup.py --runs 5 --budget 0.5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported by the command that needs them
+HEAVY_MODULES = ["pandas", "numpy", "scipy", "seaborn", "matplotlib", "docx", "canvasapi", "selenium", "tqdm"]
+
+COMMANDS = [
+    ["-c", "import main"],
+    ["main.py", "--help"],
+    ["main.py", "fetch", "--help"],
+    ["main.py", "moderate", "--help"],
+    ["main.py", "summary", "--help"],
+]
+
+
+def time_command(args, runs):
+    """
+    Runs a python command in a fresh interpreter runs times.
+
+    Returns:
+        list: Wall clock seconds for each run.
+    """
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def heavy_imports():
+    """
+    Returns the heavy modules loaded by importing main and building its parser.
+    """
+    code = (
+        "import sys, main; main.get_parser(); "
+        f"print(' '.join(x for x in {HEAVY_MODULES!r} if x in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the command line starts quickly.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command, the median is compared with the budget")
+    parser.add_argument("--budget", type=float, default=0.5, help="Seconds allowed for each command")
+    args = parser.parse_args()
+
+    failed = False
+
+    # Interpreter start up on its own, for reference
+    baseline = statistics.median(time_command(["-c", "pass"], args.runs))
+    print(f"{'python -c pass':<32} {baseline:.3f}s")
+
+    for command in COMMANDS:
+        median = statistics.median(time_command(command, args.runs))
+        status = "ok" if median <= args.budget else "SLOW"
+        failed |= status != "ok"
+        print(f"{' '.join(command):<32} {median:.3f}s {status}")
+
+    loaded = heavy_imports()
+    if loaded:
+        failed = True
+        print(f"Heavy modules imported at startup: {', '.join(loaded)}")
+    else:
+        print("No heavy modules imported at startup")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
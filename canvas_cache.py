@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Stored with the cached body, which requests has already decoded
+_DROPPED_HEADERS = ["Content-Encoding", "Content-Length", "Transfer-Encoding"]
+
+
+class ResponseCache:
+    """
+    GET responses kept on disk with the validators needed to revalidate them.
+
+    Only responses carrying an ETag or Last-Modified header are kept. Entries
+    are keyed by URL and a hash of the Authorization header, so one token never
+    sees responses cached for another. Entries older than ttl seconds are
+    dropped when the cache is opened.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 60 * 60):
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Batch workers in other processes share the cache, wait for their writes rather than fail
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, "
+            "status INTEGER, headers TEXT, content BLOB, saved_at REAL)")
+        with self.db:
+            self.db.execute("DELETE FROM responses WHERE saved_at < ?", (time.time() - ttl,))
+
+    @staticmethod
+    def key(request):
+        auth = request.headers.get("Authorization", "")
+        return hashlib.sha256(f"{request.url}\n{auth}".encode("utf-8")).hexdigest()
+
+    def get(self, request):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT etag, last_modified, status, headers, content FROM responses WHERE key = ?",
+                (self.key(request),)).fetchone()
+
+        if row is None:
+            return None
+
+        etag, last_modified, status, headers, content = row
+        return {"etag": etag, "last_modified": last_modified, "status": status, "headers": json.loads(headers), "content": content}
+
+    def put(self, request, response):
+        headers = {k: v for k, v in response.headers.items() if k not in _DROPPED_HEADERS}
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(request), request.url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 response.status_code, json.dumps(headers), response.content, time.time()))
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+class RevalidatingAdapter(HTTPAdapter):
+    """
+    Transport adapter that turns repeat GETs into conditional requests.
+
+    A GET with a cached response is sent with If-None-Match and
+    If-Modified-Since. If the server answers 304 Not Modified the cached body
+    is returned as the response, with the fresh headers (rate limit quota, ...)
+    laid over the cached ones, and its from_cache attribute set. Every other
+    response is passed back untouched, and kept if it can be revalidated.
+    """
+
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        cached = self.cache.get(request)
+        if cached is not None:
+            if cached["etag"]:
+                request.headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                request.headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            return self._from_cache(request, response, cached)
+
+        if response.status_code == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+            self.cache.put(request, response)
+
+        return response
+
+    def _from_cache(self, request, not_modified, cached):
+        response = Response()
+        response.status_code = cached["status"]
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(cached["headers"])
+        for name, value in not_modified.headers.items():
+            if name not in _DROPPED_HEADERS:
+                response.headers[name] = value
+        response._content = cached["content"]
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = not_modified.url
+        response.request = request
+        response.connection = self
+        response.elapsed = not_modified.elapsed
+        response.from_cache = True
+        return response
+
+    def close(self):
+        super().close()
+        self.cache.close()
+
+
+def use_response_cache(canvas, path, ttl=7 * 24 * 60 * 60):
+    """
+    Revalidates the GET requests canvasapi makes through an on-disk ResponseCache.
+    Does nothing if the Canvas already uses one.
+    """
+    # canvasapi doesn't expose its requests session
+    session = canvas._Canvas__requester._session
+    if isinstance(session.get_adapter("https://"), RevalidatingAdapter):
+        return
+
+    adapter = RevalidatingAdapter(ResponseCache(path, ttl=ttl))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+class CanvasObjects:
+    """
+    Courses and assignments fetched at most once per run.
+
+    Wraps a canvasapi Canvas, or anything shaped like one, and memoises
+    get_course() and the get_assignment() of the courses it returns. Every
+    other attribute is passed through to the wrapped Canvas.
+    """
+
+    def __init__(self, canvas):
+        self._canvas = canvas
+        self._courses = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._canvas, name)
+
+    def get_course(self, course_id):
+        with self._lock:
+            if course_id not in self._courses:
+                self._courses[course_id] = _CachedCourse(self._canvas.get_course(course_id))
+            return self._courses[course_id]
+
+
+class _CachedCourse:
+    def __init__(self, course):
+        self._course = course
+        self._assignments = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._course, name)
+
+    def get_assignment(self, assignment_id):
+        with self._lock:
+            if assignment_id not in self._assignments:
+                self._assignments[assignment_id] = self._course.get_assignment(assignment_id)
+            return self._assignments[assignment_id]
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+
+def one_vs_rest(df, label, group="grader"):
+    """
+    Compares each grader's scores with everyone else's in a single pass.
+
+    The label column is ranked once and each grader's rank sum gives their
+    one-vs-rest Mann-Whitney U statistic, so the two-sided p-values match
+    stats.mannwhitneyu(grader_scores, other_scores) without building a masked
+    copy of the data per grader. As in scipy, small samples with no tied values
+    get an exact p-value, which is left to scipy for those few graders.
+
+    Parameters:
+    df (DataFrame): Scores with no missing values in the label column.
+    label (str): The column to compare, e.g. 'score' or 'total_words'.
+    group (str): The column identifying the grader.
+
+    Returns:
+    DataFrame: One row per grader, in order of first appearance, with columns
+    'Grader', 'Median <label>', 'Mean <label>', 'U' and 'P-Value'.
+    """
+    values = df[label].to_numpy(dtype=float)
+    codes, graders = pd.factorize(df[group])
+
+    # Rows without a grader aren't compared themselves, but stay in everyone else's sample
+    graded = codes >= 0
+    n = len(values)
+    n1 = np.bincount(codes[graded], minlength=len(graders)).astype(float)
+    n2 = n - n1
+
+    ranks = stats.rankdata(values)
+    R1 = np.bincount(codes[graded], weights=ranks[graded], minlength=len(graders))
+    U1 = R1 - n1 * (n1 + 1) / 2
+
+    # Normal approximation with tie and continuity correction
+    _, t = np.unique(values, return_counts=True)
+    tie_term = np.sum(t.astype(float) ** 3 - t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+        numerator = U1 - n1 * n2 / 2
+        numerator -= 0.5 * np.sign(numerator)
+        z = numerator / s
+    p_values = np.clip(2 * stats.norm.sf(np.abs(z)), 0, 1)
+
+    # Exact p-values where scipy would use them
+    if not np.any(t > 1):
+        for i in np.flatnonzero((np.minimum(n1, n2) <= 8) & (n2 > 0)):
+            p_values[i] = stats.mannwhitneyu(values[codes == i], values[codes != i], alternative="two-sided").pvalue
+
+    summary = pd.Series(values[graded]).groupby(codes[graded]).agg(["median", "mean"]).reindex(range(len(graders)))
+
+    results_df = pd.DataFrame({
+        "Grader": graders,
+        f"Median {label}": summary["median"].to_numpy(),
+        f"Mean {label}": summary["mean"].to_numpy(),
+        "U": U1,
+        "P-Value": p_values,
+    })
+
+    # A grader who marked everything has no one to be compared with
+    return results_df[n2 > 0].reset_index(drop=True)
+
+
+def _criterion_results(scores, column):
+    scores = scores.assign(**{column: pd.to_numeric(scores[column], errors="coerce")})
+    scores = scores[scores[column].notnull()]
+    if scores.empty:
+        return None
+
+    results_df = one_vs_rest(scores, column).drop(columns="U")
+    results_df.columns = ["Grader", "Median", "Mean", "P-Value"]
+    results_df.insert(0, "Criterion", column[len("SCORE_"):])
+    return results_df
+
+
+def criterion_analysis(df, processes=None):
+    """
+    Runs the one-vs-rest grader comparison on every rubric criterion.
+
+    Criteria are spread across a process pool, one SCORE_ column per task.
+
+    Parameters:
+    df (DataFrame): The report, with 'grader' and SCORE_<criterion> columns.
+    processes (int): Worker processes to use. Defaults to one per CPU, 1 runs in this process.
+
+    Returns:
+    DataFrame: One row per criterion and grader with columns 'Criterion', 'Grader',
+    'Median', 'Mean' and 'P-Value', in rubric order.
+    """
+    columns = [x for x in df.columns if x.startswith("SCORE_")]
+    if processes is None:
+        processes = min(len(columns), os.cpu_count() or 1)
+
+    if processes <= 1:
+        results = [_criterion_results(df[["grader", x]], x) for x in columns]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_criterion_results, [df[["grader", x]] for x in columns], columns))
+
+    results = [x for x in results if x is not None]
+    if not results:
+        return pd.DataFrame(columns=["Criterion", "Grader", "Median", "Mean", "P-Value"])
+    return pd.concat(results, ignore_index=True)
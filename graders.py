@@ -0,0 +1,128 @@
+from canvasapi.exceptions import CanvasException
+from throttle import is_rate_limited
+from tracing import tracer
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Enrollment types that can grade submissions in a course
+GRADER_ENROLLMENT_TYPES = ["teacher", "ta"]
+
+
+class GraderDirectory:
+    """
+    Resolves grader ids to sortable names for a single course.
+
+    Teaching staff are fetched in bulk the first time a name is needed and every
+    lookup is memoised, including misses, so each grader costs at most one API
+    call per run. If cache_path is given the directory is also saved to disk and
+    reused by later runs until it is older than ttl seconds.
+    """
+
+    def __init__(self, canvas, course_id, cache_path=None, ttl=7 * 24 * 60 * 60, preload=True):
+        self.canvas = canvas
+        self.course_id = course_id
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.preload = preload
+        self.names = {}
+        self.saved_at = None
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return
+
+            if not self._read_cache():
+                self.saved_at = time.time()
+
+                if self.preload:
+                    with tracer.span("load_graders"):
+                        course = self.canvas.get_course(self.course_id)
+                        for user in course.get_users(enrollment_type=GRADER_ENROLLMENT_TYPES):
+                            self.names[user.id] = user.sortable_name
+                    self._dirty = True
+
+            self._loaded = True
+
+    def get_name(self, grader_id):
+        """
+        Returns the sortable name of a grader, or an empty string if the grader
+        can't be resolved (no grader, an auto-grader or a deleted user).
+        """
+        # Negative ids are used by Canvas for quiz and external tool auto-graders
+        if grader_id is None or grader_id < 0:
+            return ""
+
+        self.load()
+
+        if grader_id in self.names:
+            return self.names[grader_id]
+
+        with self._lock:
+            if grader_id not in self.names:
+                # Graders who aren't enrolled in the course, e.g. admins
+                tracer.count("grader_lookups")
+                try:
+                    with tracer.span("grader_lookup"):
+                        self.names[grader_id] = self.canvas.get_user(grader_id).sortable_name
+                except CanvasException as e:
+                    if is_rate_limited(e):
+                        raise
+                    self.names[grader_id] = ""
+                self._dirty = True
+
+            return self.names[grader_id]
+
+    def remember(self, grader_id, name):
+        """
+        Adds a grader whose name is already known, e.g. from a GraphQL query, so it isn't looked up.
+        """
+        if grader_id is None:
+            return
+
+        self.load()
+        with self._lock:
+            if not self.names.get(grader_id):
+                self.names[grader_id] = name
+                self._dirty = True
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        # A unique temporary file, so batch jobs saving the same course don't collide
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=cache_dir or ".", suffix=".tmp", delete=False) as f:
+            json.dump({"saved_at": self.saved_at or time.time(), "names": self.names}, f)
+        os.replace(f.name, self.cache_path)
+        self._dirty = False
+
+    def _read_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if time.time() - cache.get("saved_at", 0) > self.ttl:
+            return False
+
+        # Names looked up later are saved with the original timestamp, so the
+        # cache still expires ttl seconds after the bulk load
+        self.saved_at = cache["saved_at"]
+
+        # JSON object keys are always strings
+        self.names = {int(k): v for k, v in cache["names"].items()}
+        return True
@@ -0,0 +1,211 @@
+import datetime
+
+from canvasapi.exceptions import CanvasException
+
+from tracing import tracer
+
+# Submission states the REST API returns for an assignment by default
+SUBMISSION_STATES = ["unsubmitted", "submitted", "pending_review", "graded"]
+
+SUBMISSIONS_QUERY = """
+query AutoModeratorSubmissions($assignmentId: ID!, $first: Int!, $after: String, $updatedSince: DateTime, $states: [SubmissionState!]) {
+  assignment(id: $assignmentId) {
+    submissionsConnection(first: $first, after: $after, filter: {states: $states, updatedSince: $updatedSince}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        _id
+        attempt
+        state
+        score
+        submittedAt
+        gradedAt
+        postedAt
+        secondsLate
+        graderId
+        user { _id sortableName sisId }
+        attachments { _id displayName }
+        commentsConnection(first: 100, filter: {allComments: true}) {
+          pageInfo { hasNextPage endCursor }
+          nodes { _id comment author { _id } }
+        }
+        rubricAssessmentsConnection(first: 20) {
+          nodes {
+            assessmentType
+            updatedAt
+            assessor { _id sortableName }
+            assessmentRatings { _id points comments criterion { _id } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Comments past the first page of a submission's commentsConnection
+COMMENTS_QUERY = """
+query AutoModeratorComments($submissionId: ID!, $after: String) {
+  submission(id: $submissionId) {
+    commentsConnection(first: 100, after: $after, filter: {allComments: true}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { _id comment author { _id } }
+    }
+  }
+}
+"""
+
+RUBRIC_QUERY = """
+query AutoModeratorRubric($assignmentId: ID!) {
+  assignment(id: $assignmentId) {
+    rubric { criteria { _id description points ratings { _id description points } } }
+  }
+}
+"""
+
+
+def _query(canvas, query, variables):
+    with tracer.span("graphql_query"):
+        response = canvas.graphql(query, variables)
+
+    # GraphQL reports errors alongside the data, with a 200 status
+    if response.get("errors"):
+        raise CanvasException("; ".join(x.get("message", "") for x in response["errors"]))
+    return response["data"]
+
+
+def _timestamp(value):
+    # REST timestamps are in UTC with a Z suffix
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _id(value):
+    return int(value) if value is not None else None
+
+
+def _comments(connection):
+    return [
+        {"id": _id(x["_id"]), "author_id": _id((x.get("author") or {}).get("_id")), "comment": x.get("comment") or ""}
+        for x in (connection or {}).get("nodes", [])]
+
+
+def _latest_assessment(assessments):
+    # Peer and self assessments aren't the grade, and a regraded submission can have several
+    grading = [x for x in assessments if x.get("assessmentType", "grading") == "grading"]
+    if not grading:
+        return None
+    return max(grading, key=lambda x: _timestamp(x.get("updatedAt")) or "")
+
+
+class GraphQLSubmission:
+    """
+    A submission from a GraphQL query, with the attributes of a canvasapi
+    Submission fetched with include=["user", "submission_comments", "rubric_assessment"],
+    along with its attachments.
+
+    The grader is whoever graded the submission, as grader_id is in the REST
+    API. The rubric assessment is the latest grading assessment, and its
+    assessor is kept too, since the query comes back with their name.
+    """
+
+    def __init__(self, node):
+        self.id = _id(node.get("_id"))
+        user = node.get("user") or {}
+        self.user_id = _id(user.get("_id"))
+        self.user = {"id": self.user_id, "sortable_name": user.get("sortableName") or "", "sis_user_id": user.get("sisId")}
+        self.attempt = node.get("attempt")
+        self.workflow_state = node.get("state")
+        self.score = node.get("score")
+        self.submitted_at = _timestamp(node.get("submittedAt"))
+        self.graded_at = _timestamp(node.get("gradedAt"))
+        self.posted_at = _timestamp(node.get("postedAt"))
+        self.seconds_late = int(node["secondsLate"]) if node.get("secondsLate") is not None else None
+
+        self.attachments = [{"id": _id(x["_id"]), "display_name": x.get("displayName") or ""} for x in node.get("attachments") or []]
+
+        # Every comment, as the REST API returns, not only those on the current attempt
+        self.submission_comments = _comments(node.get("commentsConnection"))
+
+        self.grader_id = _id(node.get("graderId"))
+
+        self.rubric_assessment = {}
+        self.assessor_id = None
+        self.assessor_name = None
+        assessment = _latest_assessment((node.get("rubricAssessmentsConnection") or {}).get("nodes", []))
+        if assessment:
+            assessor = assessment.get("assessor") or {}
+            self.assessor_id = _id(assessor.get("_id"))
+            self.assessor_name = assessor.get("sortableName")
+            for rating in assessment.get("assessmentRatings") or []:
+                self.rubric_assessment[rating["criterion"]["_id"]] = {
+                    "rating_id": rating.get("_id"),
+                    "points": rating.get("points"),
+                    "comments": rating.get("comments") or "",
+                }
+
+
+def submission_pages(canvas, assignment_id, since=None, page_size=100, graders=None):
+    """
+    Yields an assignment's submissions a page at a time, following the GraphQL cursor.
+
+    Each page of submissions comes back with its user, comments and rubric
+    assessment in one query, and the few submissions with more than a page of
+    comments have the rest fetched separately. Graders named by their rubric
+    assessments are added to graders, a GraderDirectory, so they don't have to
+    be looked up.
+
+    Args:
+        since (str): Only submissions updated since this ISO 8601 time.
+
+    Yields:
+        list: GraphQLSubmission objects.
+    """
+    variables = {"assignmentId": str(assignment_id), "first": page_size, "after": None, "updatedSince": since, "states": SUBMISSION_STATES}
+
+    while True:
+        connection = _query(canvas, SUBMISSIONS_QUERY, variables)["assignment"]["submissionsConnection"]
+        page = [GraphQLSubmission(x) for x in connection["nodes"]]
+        tracer.count("pages")
+
+        for submission, node in zip(page, connection["nodes"]):
+            _fetch_remaining_comments(canvas, submission, node.get("commentsConnection"))
+
+        if graders is not None:
+            for submission in page:
+                if submission.assessor_name:
+                    graders.remember(submission.assessor_id, submission.assessor_name)
+
+        yield page
+
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        variables["after"] = connection["pageInfo"]["endCursor"]
+
+
+def _fetch_remaining_comments(canvas, submission, connection):
+    # Only submissions with more than a page of comments need another query
+    page_info = (connection or {}).get("pageInfo") or {}
+    while page_info.get("hasNextPage"):
+        variables = {"submissionId": str(submission.id), "after": page_info["endCursor"]}
+        connection = _query(canvas, COMMENTS_QUERY, variables)["submission"]["commentsConnection"]
+        submission.submission_comments += _comments(connection)
+        page_info = connection["pageInfo"]
+
+
+def get_rubric(canvas, assignment_id):
+    """
+    Returns:
+        list: The assignment's rubric criteria, shaped like the REST API's assignment.rubric.
+    """
+    rubric = _query(canvas, RUBRIC_QUERY, {"assignmentId": str(assignment_id)})["assignment"]["rubric"]
+    if rubric is None:
+        return []
+
+    return [{
+        "id": criterion["_id"],
+        "description": criterion["description"],
+        "points": criterion["points"],
+        "ratings": [{"id": x["_id"], "description": x["description"], "points": x["points"]} for x in criterion["ratings"]],
+    } for criterion in rubric["criteria"]]
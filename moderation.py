@@ -0,0 +1,214 @@
+import os
+import warnings
+
+import pandas as pd
+
+from aggregates import GradeBands, DEFAULT_BORDERLINE_WIDTH, DEFAULT_MAX_SCORE, summary_tables
+from grader_stats import one_vs_rest, criterion_analysis
+from plots import PlotRenderer, boxplot_path, render_grader_boxplot
+from rules import RULES, apply_rules, render_issues
+from settings import config_value
+from store import count_words, load_report
+from tracing import tracer
+
+warnings.filterwarnings('ignore', 'SettingWithCopyWarning')
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
+# Sheet of the moderated report recording how it was moderated
+SETTINGS_SHEET = 'Moderation settings'
+
+BOXPLOT_LABELS = ['score', 'total_words']
+
+
+def get_grade_bands():
+    # Grade boundaries can be changed in config.py
+    return GradeBands(
+        config_value("grade_bands", None),
+        borderline_width=config_value("borderline_width", DEFAULT_BORDERLINE_WIDTH),
+        max_score=config_value("max_score", DEFAULT_MAX_SCORE))
+
+
+def get_rules():
+    # Custom rules can be added in config.py, after the built in ones
+    return RULES + list(config_value("custom_rules", []))
+
+
+def grader_statistics(df, label='score'):
+    """
+    Compares each grader's label values with all the other graders'.
+
+    Returns:
+    DataFrame: One row per grader with columns 'Grader', 'Median <label>', 'Mean <label>' and 'P-Value', sorted by median.
+    """
+    df = df[pd.to_numeric(df[label], errors='coerce').notnull()]
+
+    # Compare each grader with all the others in a single ranked pass
+    results_df = one_vs_rest(df.assign(**{label: pd.to_numeric(df[label])}), label).drop(columns='U')
+    results_df.sort_values(f'Median {label}', inplace=True)
+    return results_df
+
+
+def grader_analysis(df, fpath, label='score', renderer=None):
+    # Convert 'score' column to numeric type
+    df[label] = pd.to_numeric(df[label], errors='coerce')
+
+    df = df[df[label].notnull()]
+       
+    # Grader analysis
+    global_median = df[label].median()
+    global_mean = df[label].mean() 
+
+    results_df = grader_statistics(df, label)
+
+    # The boxplot is drawn by the renderer while the statistics carry on
+    if renderer is not None:
+        renderer.submit(
+            render_grader_boxplot,
+            df[[label, 'grader']],
+            label,
+            list(results_df['Grader']),
+            list(results_df['P-Value'] < 0.05),
+            global_median,
+            boxplot_path(fpath, label))
+
+    # Get graders with significant differences
+    significant_graders = results_df[results_df['P-Value'] < 0.05]['Grader'].values
+
+    return results_df, significant_graders
+
+
+def count_total_words(df):
+    # Reports loaded from the submission store already have word counts taken at ingest.
+    # Otherwise, if annotations column exists, count the total number of words in the annotations
+    if 'total_annotations_words' in df.columns:
+        pass
+    elif 'annotations' in df.columns:
+        df['total_annotations_words'] = df['annotations'].map(count_words, na_action='ignore')
+    else:
+        df['total_annotations_words'] = 0
+
+    if 'total_comments_words' in df.columns:
+        pass
+    elif 'comments' in df.columns:
+        df['total_comments_words'] = df['comments'].map(count_words, na_action='ignore')
+    else:
+        df['total_comments_words'] = 0
+
+    # replace total_annotations_words nan with zero and make integer
+    df['total_annotations_words'] = df['total_annotations_words'].fillna(0).astype(int)
+
+    # replace total_comments_words nan with zero and make integer
+    df['total_comments_words'] = df['total_comments_words'].fillna(0).astype(int)
+
+    # Add total_words column
+    df['total_words'] = df['total_annotations_words'] + df['total_comments_words']
+
+    return df
+
+
+def moderate(fpath, anonymise_graders=False, generate_summary=False, processes=None, plots=None, compact=None):
+    """
+    Moderates a report, saving the moderated .xlsx and its charts next to it.
+
+    Parameters:
+    fpath (str): Path of the report built by fetch_report.
+    processes (int): Worker processes for the criterion analysis and charts. 1 does everything in this process.
+    plots (bool): Draw the boxplots. Defaults to plots in config.py, False is a faster statistics-only run.
+    compact (bool): Keep feedback text out of the moderated report, leaving it in the feedback side file.
+        Defaults to compact in config.py.
+    """
+    if plots is None:
+        plots = config_value("plots", True)
+    if compact is None:
+        compact = config_value("compact", False)
+
+    with tracer.span("moderate"), PlotRenderer(processes=processes, enabled=plots) as renderer:
+        _moderate(fpath, renderer, anonymise_graders, generate_summary, processes, compact)
+
+
+def _moderate(fpath, renderer, anonymise_graders, generate_summary, processes, compact=False):
+    with tracer.span("load_report"):
+        df = load_report(fpath, compact=compact)
+
+    # Add moderation columns to df. No issues by default
+    df['moderation_issue'] = ''
+    df['moderation_flags'] = 0
+    df['rubric_score_diff'] = 0
+
+    # Only keep "graded" and nonzero scores
+    df = df[df['status'] == 'graded']
+    df = df[df['score'] > 0]
+
+    df = count_total_words(df)
+
+    if anonymise_graders:
+
+        # Randomise df
+        df = df.sample(frac=1)
+
+        grader_hash = {grader: i for i, grader in enumerate(df['grader'].unique())}
+
+        # convert grader_hash to dataframe and save
+        grader_hash_df = pd.DataFrame(grader_hash.items(), columns=['grader', 'hash'])
+        grader_hash_df.to_csv(fpath.replace("moderation_report.xlsx", "grader_hash.csv"), index=False)
+
+        # Replace grader names with hash
+        df['grader'] = df['grader'].map(grader_hash)
+
+    with tracer.span("grader_analysis", label='score'):
+        results_df, significant_graders = grader_analysis(df, fpath, label='score', renderer=renderer)
+
+    if 'total_words' in df.columns:
+
+        df['total_words'] = df['total_annotations_words'] + df['total_comments_words']
+        with tracer.span("grader_analysis", label='total_words'):
+            words_df, significant_graders_words = grader_analysis(df, fpath, label='total_words', renderer=renderer)
+
+    # Values shared by the moderation rules, computed once
+    context = {
+        'rubric_total': df.filter(like='SCORE').sum(axis=1),
+        'score_stats': results_df,
+        'total_words_stats': words_df,
+    }
+
+    # Every rule sets its own bit of moderation_flags, the text is only rendered for export
+    rules = get_rules()
+    with tracer.span("rules"):
+        df['moderation_flags'] = apply_rules(df, rules, context)
+
+    rubric_mismatch = context['rubric_total'] != df['score']
+    df['rubric_score_diff'] = (context['rubric_total'] - df['score']).where(rubric_mismatch, 0)
+
+    # Grader bias on each rubric criterion, criteria are analysed in parallel
+    with tracer.span("criterion_analysis"):
+        criteria_df = criterion_analysis(df, processes=processes)
+
+    # Band and issue counts are computed once for both the report and the summary
+    aggregates = summary_tables(df, get_grade_bands(), rules)
+
+    df['moderation_issue'] = render_issues(df['moderation_flags'], rules).to_numpy()
+
+    # Boxplots left by an earlier run don't belong to this report, and may name graders
+    if not renderer.enabled:
+        for label in BOXPLOT_LABELS:
+            if os.path.exists(boxplot_path(fpath, label)):
+                os.remove(boxplot_path(fpath, label))
+
+    settings_df = pd.DataFrame({'setting': ['plots'], 'value': [renderer.enabled]})
+
+    with tracer.span("write_report"), pd.ExcelWriter(fpath) as writer:
+        df.to_excel(writer, index=False)
+        criteria_df.to_excel(writer, sheet_name='Criterion analysis', index=False)
+        for sheet_name, frame in aggregates.items():
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+        settings_df.to_excel(writer, sheet_name=SETTINGS_SHEET, index=False)
+    print(f"Moderated report saved as {fpath}")
+
+    if generate_summary:
+        from summary import write_summary
+
+        # The summary embeds the charts, so they have to be saved first
+        with tracer.span("plots_wait"):
+            renderer.wait()
+        with tracer.span("write_summary"):
+            write_summary(fpath, df, results_df, words_df, criteria_df, figures=renderer.enabled, aggregates=aggregates)
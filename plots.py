@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+
+
+def boxplot_path(fpath, label):
+    return fpath.replace("moderation_report.xlsx", f"{label}_boxplot.png")
+
+
+def render_grader_boxplot(df, label, order, significant, global_median, path):
+    """
+    Draws the horizontal box and strip plot of label by grader and saves it as a PNG.
+
+    Parameters:
+    df (DataFrame): The label and grader columns, with no missing labels.
+    label (str): The column plotted, e.g. 'score' or 'total_words'.
+    order (list): Graders in the order they are drawn.
+    significant (list): One bool per grader in order, True draws a * next to the grader.
+    global_median (float): Where the green median line is drawn.
+    path (str): Where the PNG is saved.
+
+    Returns:
+    str: The path of the saved plot.
+    """
+    # Charts are only ever saved, never shown, so no display is needed
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig = plt.figure(figsize=(10, 15))
+    try:
+        # Create the horizontal boxplot
+        sns.boxplot(x=label, y='grader', data=df, order=order, orient='h')
+
+        # add light grey vertical gridlines to the boxplot
+        plt.grid(axis='x', linestyle='--', alpha=0.5)
+
+        # Update axis labels
+        plt.xlabel(label)
+        plt.ylabel('Grader')
+
+        # Overlay the strip plot to show individual scores
+        sns.stripplot(x=label, y='grader', data=df, order=order, color='red', size=5, jitter=True, orient='h', alpha=0.5)
+
+        # Add a vertical line for the global median score
+        plt.axvline(x=global_median, color='green')
+
+        # Annotate significant differences
+        for i, is_significant in enumerate(significant):
+            if is_significant:
+                plt.text(x=df[label].max() + 1, y=i+0.3, s="*", fontsize=20, color='red', verticalalignment='center')
+
+        plt.tight_layout()
+
+        # save the plot
+        fig.savefig(path)
+    finally:
+        # Release the figure, otherwise every chart drawn stays in memory
+        plt.close(fig)
+
+    return path
+
+
+class PlotRenderer:
+    """
+    Renders moderation charts away from the statistics.
+
+    Charts submitted to the renderer are drawn in a pool of worker processes, so
+    moderation carries on while they render and several charts render at once.
+    wait() blocks until every chart is saved. With processes=1 charts are drawn
+    in this process as they are submitted, and a disabled renderer draws nothing.
+    """
+
+    def __init__(self, processes=None, enabled=True):
+        self.processes = processes
+        self.enabled = enabled
+        self.executor = None
+        self.futures = []
+
+    def submit(self, fn, *args):
+        if not self.enabled:
+            return
+
+        if self.processes == 1:
+            fn(*args)
+            return
+
+        # The pool is only started once there is something to draw
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes)
+        self.futures.append(self.executor.submit(fn, *args))
+
+    def wait(self):
+        """
+        Blocks until every submitted chart is saved, raising the first rendering error.
+        """
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
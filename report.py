@@ -0,0 +1,517 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import tqdm
+
+from annotation_cache import AnnotationCache
+from canvas_cache import CanvasObjects, use_response_cache
+from graders import GraderDirectory
+from rubric import RubricIndex, criterion_labels
+from settings import config_value
+from store import SubmissionStore
+from streaming import DEFAULT_PAGE_SIZE, SubmissionStream, iter_pages
+from sync import SyncState
+from throttle import RateLimiter
+from tracing import tracer
+
+# selenium and the annotation backends are only imported when annotations are scraped
+
+
+def get_grader_directory(canvas, course_id):
+    # Grader names are cached on disk between runs unless disabled in config.py
+    grader_cache_ttl = config_value("grader_cache_ttl", 7 * 24 * 60 * 60)
+
+    if grader_cache_ttl:
+        return GraderDirectory(canvas, course_id, cache_path=os.path.join(".cache", f"graders_{course_id}.json"), ttl=grader_cache_ttl)
+    return GraderDirectory(canvas, course_id)
+
+
+def get_session_cache_path():
+    # The Canvas login is saved and reused between runs unless disabled in config.py
+    from utils import SESSION_CACHE_PATH
+
+    return SESSION_CACHE_PATH if config_value("session_cache", True) else None
+
+
+def open_annotation_session(CANVAS_URL, session=None, cookies=None):
+    """
+    Wraps a logged-in CanvasSession in the annotation backend chosen in config.py.
+
+    Args:
+        session (CanvasSession): A browser session that has been through login.
+        cookies (list): The cookies of a login that is known to be valid, used if no session is given.
+            If neither is given, the saved login is reused while it is valid, otherwise you are asked to log in.
+
+    Returns:
+        The session itself, a BrowserPool sharing its login, or an HttpAnnotationClient using its cookies.
+    """
+    from annotations import BrowserPool, HttpAnnotationClient
+
+    # "browser" scrapes SpeedGrader, "http" reads the annotation data directly
+    annotation_backend = config_value("annotation_backend", "browser")
+
+    # Number of browsers used to scrape annotations
+    browsers = config_value("browsers", 1)
+
+    if session is None:
+        from utils import CanvasSession, saved_session
+
+        cache_path = get_session_cache_path()
+        if cookies is None and cache_path:
+            cookies = saved_session(cache_path, CANVAS_URL)
+
+        # With a valid login the http backend doesn't need a browser at all
+        if annotation_backend == "http" and cookies is not None:
+            return HttpAnnotationClient(cookies, base_url=CANVAS_URL)
+
+        session = CanvasSession(cookies=cookies, cache_path=cache_path, base_url=CANVAS_URL)
+
+    if annotation_backend == "http":
+        # The browser is only needed to log in
+        cookies = session.get_cookies()
+        session.close()
+        return HttpAnnotationClient(cookies, base_url=CANVAS_URL)
+
+    if browsers > 1:
+        return BrowserPool(session, size=browsers)
+
+    return session
+
+
+def fetch_report(canvas, CANVAS_URL, course_id, assignment_id, annotations=False, session=None, graders=None):
+    """
+    Fetches an assignment's submissions and builds its report, without prompting.
+
+    Returns:
+        str: The path of the .xlsx report.
+    """
+    # Number of rows to build concurrently, 1 builds them one at a time
+    workers = config_value("workers", 1)
+
+    # Keep every browser busy
+    if session is not None:
+        from annotations import BrowserPool
+
+        if isinstance(session, BrowserPool):
+            workers = max(workers, session.size)
+
+    # Each course and assignment is only fetched once per run
+    if not isinstance(canvas, CanvasObjects):
+        canvas = CanvasObjects(canvas)
+
+    # Unchanged responses are revalidated from the last run instead of downloaded again, unless disabled in config.py
+    http_cache_ttl = config_value("http_cache_ttl", 7 * 24 * 60 * 60)
+    if http_cache_ttl:
+        use_response_cache(canvas, os.path.join(".cache", "http.sqlite"), ttl=http_cache_ttl)
+
+    if graders is None:
+        graders = get_grader_directory(canvas, course_id)
+
+    # Count every API call canvasapi makes in the run profile
+    tracer.attach(canvas._Canvas__requester._session)
+
+    # Leave feedback text out of the spreadsheet, in a side file, if set in config.py
+    compact = config_value("compact", False)
+
+    # Keep scraped annotations between runs, only scraping new or regraded submissions, unless disabled in config.py
+    cache_annotations = config_value("annotation_cache", True)
+
+    # Only fetch submissions that changed since the last run, unless disabled in config.py
+    incremental_sync = config_value("incremental_sync", True)
+
+    # "rest" pages through the submissions API, "graphql" fetches each page of submissions with its rubric assessments in one query
+    submission_backend = config_value("submission_backend", "rest")
+
+    # Build rows from each page of submissions as it arrives, rather than fetching them all first
+    stream_submissions = config_value("stream_submissions", False)
+    page_size = config_value("page_size", DEFAULT_PAGE_SIZE)
+
+    report_path = get_report_path(canvas, course_id, assignment_id)
+    sync = SyncState(report_path.replace("moderation_report.xlsx", "sync_state.json"))
+
+    # Without the rows stored by the last run every row has to be rebuilt
+    if not incremental_sync or not os.path.exists(report_path.replace("moderation_report.xlsx", "moderation.sqlite")):
+        sync.reset()
+
+    sync_started = sync.now()
+
+    # A submission whose annotations failed to scrape hasn't changed, so an incremental
+    # sync wouldn't fetch it again. Once a retry is due every submission is fetched,
+    # but only rows that changed or are due a retry are rebuilt
+    since = sync.last_sync
+    if since is not None and annotations and cache_annotations:
+        annotation_cache = AnnotationCache(report_path.replace("moderation_report.xlsx", "annotations.sqlite"), course_id, assignment_id)
+        try:
+            if annotation_cache.retries_due():
+                since = None
+        finally:
+            annotation_cache.close()
+
+    print("Getting submissions...")
+    with tracer.span("get_submissions"):
+        submissions = get_submissions(canvas, course_id, assignment_id, since=since, stream=stream_submissions, page_size=page_size, backend=submission_backend, graders=graders)
+    print("Getting rubric...")
+    with tracer.span("get_rubric"):
+        rubric = get_rubric(canvas, course_id, assignment_id, backend=submission_backend)
+    print("Building headers...")
+    header_list = get_headers(rubric, annotations)
+    print("Building report...")
+    with tracer.span("build_report", workers=workers):
+        report_path = build_report(canvas, course_id, assignment_id, header_list, submissions, rubric, CANVAS_URL, annotations=annotations, session=session, graders=graders, workers=workers, sync=sync, compact=compact, cache_annotations=cache_annotations)
+    sync.last_sync = sync_started
+    sync.save()
+    if session is not None:
+        from annotations import render_times
+
+        session.close()
+        latency = render_times.summary()
+        if latency["count"]:
+            print(f"Scraped annotations for {latency['count']} submissions (p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s per submission)")
+
+    return report_path
+
+
+def get_submissions(canvas, course_id, assignment_id, since=None, stream=False, page_size=DEFAULT_PAGE_SIZE, prefetch=2, backend="rest", graders=None):
+    """
+    Fetches an assignment's submissions, or those graded or submitted since the last sync.
+
+    Args:
+        stream (bool): Return a SubmissionStream that fetches pages of page_size
+            submissions in the background, keeping at most prefetch pages waiting,
+            instead of a list of every submission.
+        backend (str): "rest" for the submissions API, or "graphql" for
+            GraphQLSubmission objects with the same attributes.
+        graders (GraderDirectory): With the GraphQL backend, graders named in
+            the query are added to it.
+
+    Returns:
+        list or SubmissionStream: The submissions.
+    """
+    if backend == "graphql":
+        from graphql_backend import submission_pages
+
+        pages = submission_pages(canvas, assignment_id, since=since, page_size=page_size, graders=graders)
+        if stream:
+            return SubmissionStream(pages, prefetch=prefetch)
+        return [x for page in pages for x in page]
+
+    course = canvas.get_course(course_id)
+    include = ["user", "submission_comments", "rubric_assessment"]
+
+    if stream:
+        return SubmissionStream(_submission_pages(course, assignment_id, include, since, page_size), prefetch=prefetch)
+
+    if since is None:
+        assignment = course.get_assignment(assignment_id)
+        submissions = [x for x in assignment.get_submissions(include=include)]
+        return submissions
+
+    # Only submissions graded or submitted since the last sync. Canvas applies
+    # both filters together, so they are fetched separately and merged
+    submissions = {}
+    for since_filter in ["graded_since", "submitted_since"]:
+        for x in course.get_multiple_submissions(assignment_ids=[assignment_id], student_ids="all", include=include, **{since_filter: since}):
+            submissions[x.user_id] = x
+    return list(submissions.values())
+
+
+def _submission_pages(course, assignment_id, include, since, page_size):
+    if since is None:
+        assignment = course.get_assignment(assignment_id)
+        yield from iter_pages(assignment.get_submissions(include=include, per_page=page_size), page_size)
+        return
+
+    # Submissions that were both graded and submitted since the last sync are only built once
+    seen = set()
+    for since_filter in ["graded_since", "submitted_since"]:
+        paginated = course.get_multiple_submissions(assignment_ids=[assignment_id], student_ids="all", include=include, per_page=page_size, **{since_filter: since})
+        for page in iter_pages(paginated, page_size):
+            page = [x for x in page if x.user_id not in seen]
+            seen.update(x.user_id for x in page)
+            yield page
+
+
+def get_rubric(canvas, course_id, assignment_id, backend="rest"):
+    if backend == "graphql":
+        from graphql_backend import get_rubric as get_graphql_rubric
+
+        # Criterion and rating ids match those in the GraphQL rubric assessments
+        return get_graphql_rubric(canvas, assignment_id)
+
+    course = canvas.get_course(course_id)
+    assignment = course.get_assignment(assignment_id)
+    return assignment.rubric
+
+
+def get_headers(rubric, annotations):
+    labels = criterion_labels(rubric)
+    rubric_rating_headers = [f"RATING_{x}" for x in labels]
+    rubric_score_headers = [f"SCORE_{x}" for x in labels]
+
+    header_list = [
+        "last_name",
+        "first_name",
+        "sis_user_id",
+        "submitted_at",
+        "seconds_late",
+        "status",
+        "posted_at",
+        "score",
+        "grader",
+        "comments"]
+    
+    if annotations:
+        header_list += ["annotations"]
+    
+    
+    header_list += ["url"]
+
+    header_list += rubric_rating_headers + rubric_score_headers
+
+    return header_list
+
+
+def get_rubric_rating(rubric, rubric_assessment):
+    """
+    Retrieves the descriptions of the ratings for each rubric item in the rubric assessment.
+
+    Parameters:
+    rubric (list or RubricIndex): A list of rubric items, or the rubric compiled with RubricIndex.
+    rubric_assessment (dict): A dictionary containing the rubric assessment data.
+
+    Returns:
+    list: A list of rating descriptions for each rubric item in the rubric assessment.
+    """
+    if not isinstance(rubric, RubricIndex):
+        rubric = RubricIndex(rubric)
+    return rubric.row(rubric_assessment)[0]
+
+
+def get_rubric_score(rubric, rubric_assessment):
+    """
+    Calculates the score for each rubric item based on the rubric assessment.
+
+    Parameters:
+    rubric (list or RubricIndex): The rubric containing the criteria and ratings, or the rubric compiled with RubricIndex.
+    rubric_assessment (dict): The rubric assessment containing the rating for each rubric item.
+
+    Returns:
+    list: A list of scores for each rubric item.
+    """
+    if not isinstance(rubric, RubricIndex):
+        rubric = RubricIndex(rubric)
+    return rubric.row(rubric_assessment)[1]
+
+
+def build_submission_string(canvas, header_list, rubric, submission, CANVAS_URL, course_id, assignment_id, annotations=False, session=None, graders=None, annotation_cache=None):
+    """
+    Builds a row of data for a submission in a Canvas assignment report.
+
+    Args:
+        rubric (RubricIndex): The compiled rubric. A plain rubric list is compiled for this row only.
+        submission (Submission): The submission object representing a student's submission.
+        graders (GraderDirectory): Shared grader name lookup. If not given, the grader is looked up on its own.
+        annotation_cache (AnnotationCache): Annotations scraped by earlier runs. If not given, annotations are always scraped.
+
+    Returns:
+        list: A list containing the row of data for the submission, including student information,
+              submission details, grading information, and rubric ratings and scores.
+    """
+    
+    sortable_name = f'{submission.user["sortable_name"]}'
+    last_name, first_name = sortable_name.split(", ")
+    sis_user_id = submission.user["sis_user_id"]
+    submitted_at = submission.submitted_at
+    seconds_late = submission.seconds_late
+    status = submission.workflow_state
+    posted_at = submission.posted_at
+    score = submission.score
+
+    if annotations:
+        from annotations import get_annotations
+
+        url = f"{CANVAS_URL}/courses/{course_id}/gradebook/speed_grader?assignment_id={assignment_id}&student_id={submission.user_id}"
+        with tracer.span("get_annotations"):
+            # Only attachments open in DocViewer. Text entries, URLs, media and
+            # students who haven't submitted have nothing to annotate.
+            if not getattr(submission, "attachments", None):
+                ann = []
+            elif annotation_cache is not None:
+                ann = annotation_cache.get_annotations(session, submission, url)
+            else:
+                ann = get_annotations(session, url)
+        ann = ",".join([x["comment"] for x in ann])
+
+    url = f"{CANVAS_URL}/courses/{course_id}/gradebook/speed_grader?assignment_id={assignment_id}&student_id={submission.user_id}"
+
+    if graders is None:
+        graders = GraderDirectory(canvas, course_id, preload=False)
+
+    grader = graders.get_name(submission.grader_id)
+    
+    try:
+        rubric_assessment = submission.rubric_assessment
+    except:
+        rubric_assessment = ""
+        
+    comments = ", ".join([f"{x["comment"]}" for x in submission.submission_comments])
+
+    if not isinstance(rubric, RubricIndex):
+        rubric = RubricIndex(rubric)
+
+    rubric_rating, rubric_score = rubric.row(rubric_assessment)
+
+    values = [
+        last_name,
+        first_name,
+        sis_user_id,
+        submitted_at,
+        seconds_late,
+        status,
+        posted_at,
+        score,
+        grader,
+        comments]
+    
+    if annotations:
+        values += [ann]
+
+    values += [
+        url
+    ]
+
+    values += rubric_rating + rubric_score
+
+    row = {}
+
+    for header, value in zip(header_list, values):
+        row[header] = value
+        
+    return row
+
+
+def get_report_path(canvas, course_id, assignment_id):
+    course = canvas.get_course(course_id)
+    assignment = course.get_assignment(assignment_id)
+    dirname = course.course_code
+    subdirname = assignment.name[:20].replace(" ", "_")
+
+    # check if course directory exists, if not, create it
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    # check if assignment directory exists, if not, create it
+    if not os.path.exists(os.path.join(dirname, assignment.name[:20].replace(" ", "_"))):
+        os.makedirs(os.path.join(dirname, subdirname))
+
+    return os.path.join(dirname, subdirname, f"{assignment.name[:20].replace(" ", "_")}_moderation_report.xlsx")
+
+
+def build_report(canvas, course_id, assignment_id, header_list, submissions, rubric, CANVAS_URL, annotations=False, session=None, graders=None, workers=1, limiter=None, sync=None, compact=False, cache_annotations=False):
+    fpath = get_report_path(canvas, course_id, assignment_id)
+
+    # Compile the rubric once for every row
+    if not isinstance(rubric, RubricIndex):
+        rubric = RubricIndex(rubric)
+
+    # Finished rows are committed to the submission store as they are built, so
+    # an interrupted run can resume without re-reading the spreadsheet
+    store = SubmissionStore(fpath.replace("moderation_report.xlsx", "moderation.sqlite"), course_id, assignment_id, header_list, criteria=rubric.criteria)
+    stored = store.user_ids()
+
+    # Each scrape is kept as soon as it finishes, so a crashed scrape resumes where it stopped
+    annotation_cache = None
+    if annotations and cache_annotations:
+        annotation_cache = AnnotationCache(fpath.replace("moderation_report.xlsx", "annotations.sqlite"), course_id, assignment_id)
+
+    if graders is None:
+        graders = GraderDirectory(canvas, course_id)
+
+    def changed(submission):
+        # Rows are rebuilt if they are missing, if the submission changed since it was
+        # last synced, or if its annotations failed to scrape last time
+        return (submission.user_id not in stored
+                or (sync is not None and sync.changed(submission))
+                or (annotation_cache is not None and annotation_cache.pending(submission)))
+
+    def build_row(submission):
+        with tracer.span("build_row"):
+            return build_submission_string(canvas, header_list, rubric, submission, CANVAS_URL, course_id, assignment_id, annotations=annotations, session=session, graders=graders, annotation_cache=annotation_cache)
+
+    def record(submission, row):
+        with tracer.span("store_row"):
+            store.put(submission.user_id, row)
+        if sync is not None:
+            sync.mark(submission)
+
+    try:
+        if isinstance(submissions, SubmissionStream):
+            # The number of submissions isn't known until the stream has been read
+            total, initial = None, 0
+            pending = _pending(submissions, changed, lambda: progress.update(1))
+        else:
+            pending = [x for x in submissions if changed(x)]
+            total, initial = len(submissions), len(submissions) - len(pending)
+
+        with tqdm.tqdm(total=total, initial=initial, desc="Building submission rows") as progress:
+            if workers > 1:
+                if limiter is None:
+                    limiter = RateLimiter(workers)
+                    limiter.attach(canvas)
+
+                executor = ThreadPoolExecutor(max_workers=workers)
+                try:
+                    # Rows finish out of order, but are stored in submission order
+                    # as soon as every earlier row is done. Only a few rows per
+                    # worker are in flight, so a stream is read as rows are built
+                    # and each submission is let go once its row is stored.
+                    # Progress counts rows as they finish, not as they are stored
+                    in_flight = deque()
+                    for submission in pending:
+                        future = executor.submit(limiter.call, build_row, submission)
+                        future.add_done_callback(lambda _: progress.update(1))
+                        in_flight.append((submission, future))
+                        while in_flight and (len(in_flight) >= workers * 4 or in_flight[0][1].done()):
+                            submission, future = in_flight.popleft()
+                            record(submission, future.result())
+
+                    while in_flight:
+                        submission, future = in_flight.popleft()
+                        record(submission, future.result())
+                finally:
+                    executor.shutdown(cancel_futures=True)
+            else:
+                for submission in pending:
+                    record(submission, build_row(submission))
+                    progress.update(1)
+
+        # Export the report once, in a single pass
+        with tracer.span("export_report"):
+            store.export(fpath, header_list, compact=compact)
+    finally:
+        if isinstance(submissions, SubmissionStream):
+            submissions.close()
+        store.close()
+        if annotation_cache is not None:
+            annotation_cache.close()
+
+        # Keep the fingerprints of the rows that were built, even if the run stopped part way
+        if sync is not None:
+            sync.save()
+
+    graders.save()
+    if annotation_cache is not None:
+        print(annotation_cache.summary())
+    print(f"Report saved as {fpath}")
+
+    return fpath
+
+
+def _pending(submissions, changed, skipped):
+    # Submissions whose rows need building, calling skipped for every other one
+    for submission in submissions:
+        if changed(submission):
+            yield submission
+        else:
+            skipped()
@@ -0,0 +1,58 @@
+def criterion_labels(rubric):
+    """
+    Returns:
+        list: Each criterion's description, in rubric order, numbered where criteria share a
+        description so every criterion gets its own RATING_ and SCORE_ columns.
+    """
+    labels = []
+    for item in rubric:
+        label = item["description"]
+        n = 2
+        while label in labels:
+            label = f"{item['description']} ({n})"
+            n += 1
+        labels.append(label)
+    return labels
+
+
+class RubricIndex:
+    """
+    A rubric compiled once into per-criterion lookups of rating_id -> (description, points).
+
+    Every lookup returns exactly one rating and one score per criterion, in rubric
+    order, so the RATING_ and SCORE_ columns always line up with their headers.
+    A criterion that wasn't assessed, or whose rating_id isn't in the rubric,
+    gets an empty rating and falls back to the points recorded in the assessment.
+    """
+
+    def __init__(self, rubric):
+        self.criteria = [item["id"] for item in rubric]
+        self.ratings = [
+            {rating["id"]: (rating["description"] or "", rating["points"]) for rating in item["ratings"]}
+            for item in rubric]
+
+    def __len__(self):
+        return len(self.criteria)
+
+    def row(self, rubric_assessment):
+        """
+        Returns the rating descriptions and scores for one rubric assessment.
+
+        Returns:
+            tuple: A list of rating descriptions and a list of scores, one per criterion.
+        """
+        ratings_list = []
+        scores_list = []
+        for criterion_id, ratings in zip(self.criteria, self.ratings):
+            assessment = (rubric_assessment or {}).get(criterion_id) or {}
+            rating = ratings.get(assessment.get("rating_id"))
+
+            if rating is not None:
+                ratings_list.append(rating[0])
+                scores_list.append(rating[1])
+            else:
+                ratings_list.append("")
+                points = assessment.get("points")
+                scores_list.append("" if points is None else points)
+
+        return ratings_list, scores_list
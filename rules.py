@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+class Rule:
+    """
+    A moderation check run over the whole report at once.
+
+    check(df, context) returns a boolean mask of the submissions with the issue.
+    context holds the values shared by every rule, computed once per run:
+    'rubric_total' (the sum of each row's SCORE_ columns) and '<label>_stats'
+    (grader_statistics of 'score' and 'total_words').
+
+    Parameters:
+    text (str): The issue written to the moderation_issue column of the report.
+    check (callable): Takes the report and the context and returns the mask.
+    description (str): How the issue is described in the summary. Defaults to text.
+    """
+
+    def __init__(self, text, check, description=None):
+        self.text = text
+        self.check = check
+        self.description = description or text
+
+
+def grader_bias(label, higher):
+    """
+    Flags every submission marked by a grader whose median label is significantly
+    higher (or lower) than the median of the whole cohort.
+    """
+    def check(df, context):
+        stats = context[f"{label}_stats"]
+        significant = stats[stats["P-Value"] < 0.05]
+        is_higher = significant[f"Median {label}"] > df[label].median()
+        graders = significant["Grader"][is_higher if higher else ~is_higher]
+        return df["grader"].isin(graders)
+
+    return check
+
+
+def rubric_total_mismatch(df, context):
+    return context["rubric_total"] != df["score"]
+
+
+def no_written_feedback(df, context):
+    return df["total_words"] == 0
+
+
+# Rules in the order their issues are listed, each sets its own bit of moderation_flags
+RULES = [
+    Rule("Grader median score is significantly lower than global median", grader_bias("score", higher=False),
+         "Grader median score is significantly lower than global median score"),
+    Rule("Grader median score is significantly higher than global median", grader_bias("score", higher=True),
+         "Grader median score is significantly higher than global median score"),
+    Rule("Grader median feedback word count is significantly lower than global median", grader_bias("total_words", higher=False),
+         "Grader median feedback word count is significantly lower than global median word count"),
+    Rule("Grader median feedback word count is significantly higher than global median", grader_bias("total_words", higher=True),
+         "Grader median feedback word count is significantly higher than global median word count"),
+    Rule("Final score is different to rubric total", rubric_total_mismatch),
+    Rule("No written feedback", no_written_feedback),
+]
+
+
+def apply_rules(df, rules, context):
+    """
+    Runs every rule over the report.
+
+    Returns:
+        ndarray: One int64 per submission with bit i set if rules[i] flagged it.
+    """
+    if len(rules) > 63:
+        raise ValueError("At most 63 moderation rules can be flagged")
+
+    flags = np.zeros(len(df), dtype=np.int64)
+    for bit, rule in enumerate(rules):
+        mask = np.asarray(rule.check(df, context), dtype=bool)
+        flags |= mask.astype(np.int64) << bit
+    return flags
+
+
+def render_issues(flags, rules):
+    """
+    Renders moderation flags as the issue text written to the report, e.g.
+    "Final score is different to rubric total, No written feedback, ".
+    """
+    flags = pd.Series(flags)
+
+    # Only a handful of distinct combinations occur, so each is rendered once
+    text = {
+        value: "".join(f"{rule.text}, " for bit, rule in enumerate(rules) if value >> bit & 1)
+        for value in flags.unique()}
+    return flags.map(text)
+
+
+def parse_issues(moderation_issues, rules):
+    """
+    Recovers moderation flags from issue text, for reports moderated before the
+    flags were saved.
+    """
+    moderation_issues = pd.Series(moderation_issues).fillna("")
+    flags = np.zeros(len(moderation_issues), dtype=np.int64)
+    for bit, rule in enumerate(rules):
+        flags |= moderation_issues.str.contains(rule.text, regex=False).to_numpy().astype(np.int64) << bit
+    return flags
@@ -2,3 +2,20 @@ CANVAS_URL = '<YOUR CANVAS URL>'
 CANVAS_TOKEN = '<YOUR CANVAS TOKEN>'
 #course_id = 69023 OPTIONAL
 #assignment_id = 256081 OPTIONAL
+#grader_cache_ttl = 604800 OPTIONAL. Seconds to reuse cached grader names, 0 to disable the cache
+#http_cache_ttl = 604800 OPTIONAL. Seconds to keep Canvas responses for revalidation, 0 to disable the cache
+#workers = 4 OPTIONAL. Number of report rows to build concurrently
+#browsers = 4 OPTIONAL. Number of browsers used to scrape annotations
+#annotation_backend = 'http' OPTIONAL. 'browser' (default) scrapes SpeedGrader, 'http' reads annotations without rendering it
+#session_cache = False OPTIONAL. Set to False to log in to Canvas every run instead of reusing the saved login
+#annotation_cache = False OPTIONAL. Set to False to scrape every submission's annotations again instead of only new or regraded ones
+#incremental_sync = False OPTIONAL. Set to False to refetch every submission instead of only those changed since the last run
+#submission_backend = 'graphql' OPTIONAL. 'rest' (default) pages through the submissions API, 'graphql' fetches submissions with their comments and rubric assessments in bulk
+#stream_submissions = True OPTIONAL. Build report rows from each page of submissions as it arrives, keeping memory bounded for large cohorts
+#page_size = 100 OPTIONAL. Submissions requested per page
+#plots = False OPTIONAL. Set to False to skip the moderation boxplots
+#grade_bands = [("Fail", 0), ("Pass", 40), ("2.2", 50), ("2.1", 60), ("1st", 70)] OPTIONAL. Grade bands in the summary as (name, lowest score)
+#borderline_width = 2 OPTIONAL. Scores this close below a band boundary are borderline
+#max_score = 100 OPTIONAL. The top of the highest grade band
+#custom_rules = [Rule('Late but not penalised', lambda df, context: (df['seconds_late'] > 0) & (df['score'] >= 70))] OPTIONAL. Extra moderation checks, needs: from rules import Rule
+#compact = True OPTIONAL. Keep feedback text out of the reports, in a feedback.csv side file, and only carry its word counts
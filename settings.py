@@ -0,0 +1,7 @@
+def config_value(name, default):
+    # Optional settings can be left out of config.py
+    try:
+        import config
+    except ImportError:
+        return default
+    return getattr(config, name, default)
@@ -0,0 +1,299 @@
+import json
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+# Report columns stored on the submissions table, the rest of a row is split
+# into the rubric and feedback tables
+SUBMISSION_COLUMNS = [
+    "last_name",
+    "first_name",
+    "sis_user_id",
+    "submitted_at",
+    "seconds_late",
+    "status",
+    "posted_at",
+    "score",
+    "grader",
+    "url"]
+
+FEEDBACK_COLUMNS = ["comments", "annotations"]
+
+WORD = re.compile(r"\S+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    PRIMARY KEY (course_id, assignment_id)
+);
+
+CREATE TABLE IF NOT EXISTS submissions (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    last_name TEXT,
+    first_name TEXT,
+    sis_user_id TEXT,
+    submitted_at TEXT,
+    seconds_late INTEGER,
+    status TEXT,
+    posted_at TEXT,
+    score REAL,
+    grader TEXT,
+    url TEXT,
+    PRIMARY KEY (course_id, assignment_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS submissions_user_id ON submissions (user_id);
+CREATE INDEX IF NOT EXISTS submissions_grader ON submissions (course_id, assignment_id, grader);
+CREATE INDEX IF NOT EXISTS submissions_seq ON submissions (course_id, assignment_id, seq);
+
+CREATE TABLE IF NOT EXISTS rubric_assessments (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    criterion_id TEXT NOT NULL,
+    criterion TEXT NOT NULL,
+    rating TEXT,
+    points REAL,
+    PRIMARY KEY (course_id, assignment_id, user_id, criterion_id)
+);
+CREATE INDEX IF NOT EXISTS rubric_assessments_criterion ON rubric_assessments (course_id, assignment_id, criterion);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT,
+    words INTEGER,
+    PRIMARY KEY (course_id, assignment_id, user_id, kind)
+);
+"""
+
+
+def count_words(text):
+    """
+    Counts the words in text as str.split() would, without building the list of words.
+    """
+    if not isinstance(text, str):
+        return 0
+    return sum(1 for _ in WORD.finditer(text))
+
+
+def word_count_column(kind):
+    return f"total_{kind}_words"
+
+
+class SubmissionStore:
+    """
+    Local SQLite store of the report rows for an assignment.
+
+    This is the system of record for a run: rows are committed one at a time as
+    they are built, so an interrupted run resumes from the store, and moderation
+    reads its data frame back from here. The .xlsx report is only an export.
+
+    Rubric ratings are stored by criterion id, given in rubric order as criteria,
+    along with the label of their RATING_ and SCORE_ columns.
+    """
+
+    def __init__(self, path, course_id, assignment_id, header_list=None, criteria=None):
+        self.path = path
+        self.course_id = course_id
+        self.assignment_id = assignment_id
+        self.criteria = criteria
+
+        # Wait for writes from another process, e.g. a batch job for the same assignment
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.executescript(SCHEMA)
+        self._migrate()
+
+        if header_list is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO reports (course_id, assignment_id, headers) VALUES (?, ?, ?)",
+                (course_id, assignment_id, json.dumps(header_list)))
+            self.db.commit()
+
+    def _migrate(self):
+        # Stores written before word counts were kept at ingest are counted once here
+        if "words" not in [x[1] for x in self.db.execute("PRAGMA table_info(feedback)")]:
+            with self.db:
+                self.db.execute("ALTER TABLE feedback ADD COLUMN words INTEGER")
+                self.db.executemany(
+                    "UPDATE feedback SET words = ? WHERE rowid = ?",
+                    [(count_words(text), rowid) for rowid, text in self.db.execute("SELECT rowid, text FROM feedback")])
+
+        # Stores written before ratings were keyed by criterion id use the label as the id
+        if "criterion_id" not in [x[1] for x in self.db.execute("PRAGMA table_info(rubric_assessments)")]:
+            self.db.executescript(
+                "BEGIN;"
+                "ALTER TABLE rubric_assessments RENAME TO rubric_assessments_old;"
+                "DROP INDEX rubric_assessments_criterion;"
+                + SCHEMA +
+                "INSERT INTO rubric_assessments (course_id, assignment_id, user_id, criterion_id, criterion, rating, points) "
+                "SELECT course_id, assignment_id, user_id, criterion, criterion, rating, points FROM rubric_assessments_old;"
+                "DROP TABLE rubric_assessments_old;"
+                "COMMIT;")
+
+    @classmethod
+    def open_report(cls, path):
+        """
+        Opens the store written by build_report, for the single assignment it holds.
+        """
+        db = sqlite3.connect(path, timeout=30)
+        course_id, assignment_id = db.execute("SELECT course_id, assignment_id FROM reports").fetchone()
+        db.close()
+        return cls(path, course_id, assignment_id)
+
+    @property
+    def header_list(self):
+        headers = self.db.execute(
+            "SELECT headers FROM reports WHERE course_id = ? AND assignment_id = ?",
+            (self.course_id, self.assignment_id)).fetchone()
+        return json.loads(headers[0]) if headers else None
+
+    def user_ids(self):
+        return {x[0] for x in self.db.execute(
+            "SELECT user_id FROM submissions WHERE course_id = ? AND assignment_id = ?",
+            (self.course_id, self.assignment_id))}
+
+    def put(self, user_id, row):
+        """
+        Writes a report row, replacing any earlier row for the same user.
+        """
+        # Empty cells are stored as NULL, as they would read back from Excel
+        row = {k: (None if v == "" else v) for k, v in row.items()}
+        key = (self.course_id, self.assignment_id, user_id)
+
+        with self.db:
+            # Keep the position of a row that is being rebuilt
+            seq = self.db.execute(
+                "SELECT seq FROM submissions WHERE course_id = ? AND assignment_id = ? AND user_id = ?", key).fetchone()
+            if seq is None:
+                seq = self.db.execute(
+                    "SELECT COALESCE(MAX(seq), -1) + 1 FROM submissions WHERE course_id = ? AND assignment_id = ?",
+                    key[:2]).fetchone()
+
+            self.db.execute(
+                f"INSERT OR REPLACE INTO submissions (course_id, assignment_id, user_id, seq, {', '.join(SUBMISSION_COLUMNS)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(SUBMISSION_COLUMNS))})",
+                key + (seq[0],) + tuple(row.get(x) for x in SUBMISSION_COLUMNS))
+
+            self.db.execute("DELETE FROM rubric_assessments WHERE course_id = ? AND assignment_id = ? AND user_id = ?", key)
+            labels = [x[len("RATING_"):] for x in row if x.startswith("RATING_")]
+            criteria = self.criteria if self.criteria is not None and len(self.criteria) == len(labels) else labels
+            self.db.executemany(
+                "INSERT INTO rubric_assessments (course_id, assignment_id, user_id, criterion_id, criterion, rating, points) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [key + (str(criterion_id), x, row.get(f"RATING_{x}"), row.get(f"SCORE_{x}")) for criterion_id, x in zip(criteria, labels)])
+
+            self.db.execute("DELETE FROM feedback WHERE course_id = ? AND assignment_id = ? AND user_id = ?", key)
+            # Words are counted as the text comes in, so moderation never has to split it
+            self.db.executemany(
+                "INSERT INTO feedback (course_id, assignment_id, user_id, kind, text, words) VALUES (?, ?, ?, ?, ?, ?)",
+                [key + (x, row[x], count_words(row[x])) for x in FEEDBACK_COLUMNS if x in row])
+
+    def to_frame(self, header_list=None, word_counts=False, compact=False):
+        """
+        Reads the report back as a data frame with the same columns as the .xlsx export.
+
+        Parameters:
+        word_counts (bool): Add a total_<kind>_words column for each feedback column, counted at ingest.
+        compact (bool): Leave the feedback text out, keeping its word counts and a user_id
+            column to look the text up in the feedback side file.
+        """
+        if header_list is None:
+            header_list = self.header_list
+
+        params = (self.course_id, self.assignment_id)
+
+        df = pd.read_sql_query(
+            f"SELECT user_id, {', '.join(SUBMISSION_COLUMNS)} FROM submissions "
+            "WHERE course_id = ? AND assignment_id = ? ORDER BY seq",
+            self.db, params=params, index_col="user_id")
+
+        kinds = [x for x in FEEDBACK_COLUMNS if x in header_list]
+        feedback = pd.read_sql_query(
+            f"SELECT user_id, kind, {'words' if compact else 'text, words'} FROM feedback WHERE course_id = ? AND assignment_id = ?",
+            self.db, params=params)
+        if not compact:
+            df = df.join(feedback.pivot(index="user_id", columns="kind", values="text"))
+        if word_counts or compact:
+            words = feedback.pivot(index="user_id", columns="kind", values="words")
+            words.columns = [word_count_column(x) for x in words.columns]
+            df = df.join(words)
+
+        rubric = pd.read_sql_query(
+            "SELECT user_id, criterion, rating, points FROM rubric_assessments WHERE course_id = ? AND assignment_id = ?",
+            self.db, params=params)
+        ratings = rubric.pivot(index="user_id", columns="criterion", values="rating").add_prefix("RATING_")
+        points = rubric.pivot(index="user_id", columns="criterion", values="points").add_prefix("SCORE_")
+        df = df.join(ratings).join(points)
+
+        columns = list(header_list)
+        if compact:
+            columns = ["user_id"] + [x for x in columns if x not in FEEDBACK_COLUMNS]
+            df = df.reset_index()
+        if word_counts or compact:
+            columns += [word_count_column(x) for x in kinds]
+
+        return df.reindex(columns=columns).reset_index(drop=True)
+
+    def export_feedback(self, fpath):
+        """
+        Writes the feedback text to a .csv side file with one row per submission, by user_id.
+        """
+        feedback = pd.read_sql_query(
+            "SELECT user_id, kind, text FROM feedback WHERE course_id = ? AND assignment_id = ?",
+            self.db, params=(self.course_id, self.assignment_id))
+        feedback = feedback.pivot(index="user_id", columns="kind", values="text")
+        feedback.reindex(columns=[x for x in FEEDBACK_COLUMNS if x in feedback.columns]).to_csv(fpath)
+
+    def export(self, fpath, header_list=None, compact=False):
+        """
+        Exports the report as .xlsx. A compact export leaves the feedback text
+        out of the spreadsheet and writes it to the feedback side file instead.
+        """
+        if compact:
+            self.export_feedback(feedback_path(fpath))
+        self.to_frame(header_list, compact=compact).to_excel(fpath, index=False)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def feedback_path(fpath):
+    return fpath.replace("moderation_report.xlsx", "feedback.csv")
+
+
+def load_report(fpath, compact=False):
+    """
+    Loads a report for moderation from its submission store, falling back to the
+    .xlsx for reports built before the store existed.
+
+    Reports loaded from the store carry the word counts taken at ingest. A compact
+    report has no feedback text, which is left in the feedback side file.
+    """
+    store_path = fpath.replace("moderation_report.xlsx", "moderation.sqlite")
+    if not os.path.exists(store_path):
+        df = pd.read_excel(fpath)
+        if compact:
+            # The text stays in the .xlsx it was read from
+            for kind in FEEDBACK_COLUMNS:
+                if kind in df.columns:
+                    df[word_count_column(kind)] = df.pop(kind).map(count_words)
+        return df
+
+    with SubmissionStore.open_report(store_path) as store:
+        if compact:
+            store.export_feedback(feedback_path(fpath))
+        return store.to_frame(word_counts=True, compact=compact)
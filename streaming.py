@@ -0,0 +1,103 @@
+import itertools
+import queue
+import threading
+
+from tracing import tracer
+
+# Canvas caps per_page at 100 on most endpoints
+DEFAULT_PAGE_SIZE = 100
+
+_DONE = object()
+
+
+def iter_pages(items, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yields a paginated list one page at a time, without keeping earlier pages.
+
+    A canvasapi PaginatedList keeps every element it has fetched for as long
+    as the list itself is alive, so its pages are requested directly instead.
+    Anything else, e.g. a plain list, is split into pages of page_size as it
+    is iterated.
+
+    _get_next_page() and _has_next() are private to canvasapi, as of 3.6.0. If a
+    release drops them, the list is iterated normally, which is correct but
+    keeps every page in memory.
+    """
+    if hasattr(items, "_get_next_page") and hasattr(items, "_has_next"):
+        while items._has_next():
+            with tracer.span("fetch_page"):
+                page = items._get_next_page()
+            tracer.count("pages")
+            yield page
+        return
+
+    items = iter(items)
+    while page := list(itertools.islice(items, page_size)):
+        yield page
+
+
+class SubmissionStream:
+    """
+    Fetches pages of submissions in a background thread while rows are built.
+
+    Iterating the stream yields submissions one at a time as their pages
+    arrive. At most prefetch pages are held waiting to be built, so memory
+    stays bounded however large the cohort is, and the next page is being
+    fetched while the current one is processed. Errors raised while fetching
+    are raised again from the iteration. Stop early with close().
+
+    Parameters:
+    pages (iterable): Lists of submissions, e.g. from iter_pages().
+    prefetch (int): Pages fetched ahead of the rows being built.
+    """
+
+    def __init__(self, pages, prefetch=2):
+        self.pages = pages
+        self._queue = queue.Queue(maxsize=max(1, prefetch))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _produce(self):
+        try:
+            for page in self.pages:
+                if not self._put(page):
+                    return
+        except BaseException as e:
+            self._put(e)
+            return
+        self._put(_DONE)
+
+    def _put(self, item):
+        # Give up if the consumer has stopped reading
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._produce, daemon=True)
+            self._thread.start()
+
+        try:
+            while True:
+                page = self._queue.get()
+                if page is _DONE:
+                    return
+                if isinstance(page, BaseException):
+                    raise page
+
+                # Hand the submissions over one by one, so each can be freed once its row is built
+                page.reverse()
+                while page:
+                    yield page.pop()
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
@@ -0,0 +1,446 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+NOT_FOUND = {"errors": [{"message": "The specified resource does not exist."}]}
+
+
+class Cassette:
+    """
+    Recorded HTTP responses, stored as a JSON list of interactions.
+
+    Attach record() as a requests response hook to capture a live session, then
+    serve the file with StubServer to replay it offline. Responses are matched
+    on method, path and query string, and on the request body if it has one, so
+    GraphQL queries for different pages replay their own responses. Absolute
+    redirect locations are stored as paths so replayed redirects stay on the stub.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f)
+
+    def record(self, response, *args, **kwargs):
+        # requests calls response hooks for every hop of a redirect chain
+        url = urlsplit(response.url)
+        headers = {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "location", "link") or k.lower().startswith("x-")}
+        if "Location" in headers:
+            location = urlsplit(headers["Location"])
+            headers["Location"] = location.path + (f"?{location.query}" if location.query else "")
+
+        body = response.request.body
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+
+        with self._lock:
+            self.interactions.append({
+                "method": response.request.method,
+                "path": url.path,
+                "query": url.query,
+                "request_body": body,
+                "status": response.status_code,
+                "headers": headers,
+                "body": response.text,
+            })
+
+    def save(self):
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.interactions, f, indent=2)
+
+    def find(self, method, path, query, body=None):
+        # Prefer an exact query and body match, then any recording of the path
+        matches = [x for x in self.interactions if x["method"] == method and x["path"] == path]
+        for interaction in matches:
+            if interaction["query"] == query and interaction.get("request_body") == body:
+                return interaction
+        for interaction in matches:
+            if interaction["query"] == query:
+                return interaction
+        return matches[0] if matches else None
+
+
+class LeakyBucket:
+    """
+    Canvas style API quota.
+
+    Every request adds its cost to the bucket, which drains at leak_rate units a
+    second. A request that would overflow the bucket is refused. remaining is
+    what X-Rate-Limit-Remaining reports.
+    """
+
+    def __init__(self, capacity=700, leak_rate=10, cost=1.0):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.cost = cost
+        self.level = 0
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def charge(self):
+        """
+        Charges one request.
+
+        Returns:
+            tuple: Whether the request is allowed, and the quota remaining.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.level = max(0, self.level - (now - self.updated) * self.leak_rate)
+            self.updated = now
+
+            if self.level + self.cost > self.capacity:
+                self.throttled += 1
+                return False, self.capacity - self.level
+
+            self.level += self.cost
+            return True, self.capacity - self.level
+
+
+class SyntheticAPI:
+    """
+    The Canvas REST endpoints the tool uses, answered from a SyntheticCohort.
+
+    Lists are paginated like Canvas: per_page items a page (default_per_page if
+    the client doesn't ask, never more than max_per_page) with a Link header
+    pointing at the next page. canvasapi always asks for 100, so max_per_page
+    sets the page size it gets.
+
+    POST /api/graphql answers the submission, comment and rubric queries sent
+    by graphql_backend.py, told apart by the fields they ask for, with cursor
+    pagination. Comments are paginated too, max_per_page at a time, and like
+    Canvas only those on the current attempt are returned unless the query
+    asks for allComments. It isn't a GraphQL server; other queries get an error.
+    """
+
+    def __init__(self, cohort, default_per_page=10, max_per_page=100):
+        self.cohort = cohort
+        self.default_per_page = default_per_page
+        self.max_per_page = max_per_page
+        self.routes = [
+            (r"/api/v1/courses/(\d+)", self.course),
+            (r"/api/v1/courses/(\d+)/assignments/(\d+)", self.assignment),
+            (r"/api/v1/courses/(\d+)/assignments/(\d+)/submissions", self.submissions),
+            (r"/api/v1/courses/(\d+)/students/submissions", self.multiple_submissions),
+            (r"/api/v1/courses/(\d+)/(?:search_)?users", self.users),
+            (r"/api/v1/users/(\d+)", self.user),
+        ]
+        self.graders = {x["id"]: x for x in cohort.graders}
+
+    def respond(self, method, path, query, base_url, body=None):
+        """
+        Returns:
+            tuple: The status, headers and JSON body of the response.
+        """
+        if method == "POST" and path == "/api/graphql":
+            return self.graphql(json.loads(body or "{}"))
+
+        if method == "GET":
+            for pattern, handler in self.routes:
+                match = re.fullmatch(pattern, path)
+                if match:
+                    return handler(parse_qs(query), base_url + path, *[int(x) for x in match.groups()])
+        return 404, {}, NOT_FOUND
+
+    def paginate(self, items, params, url):
+        per_page = min(int(params.get("per_page", [self.default_per_page])[0]), self.max_per_page)
+        page = int(params.get("page", ["1"])[0])
+
+        headers = {}
+        if page * per_page < len(items):
+            next_params = {k: v for k, v in params.items() if k != "page"}
+            next_params["page"] = [str(page + 1)]
+            headers["Link"] = f'<{url}?{urlencode(next_params, doseq=True)}>; rel="next"'
+        return 200, headers, items[(page - 1) * per_page:page * per_page]
+
+    def _exists(self, course_id, assignment_id=None):
+        return course_id == self.cohort.course["id"] and assignment_id in (None, self.cohort.assignment["id"])
+
+    def course(self, params, url, course_id):
+        if not self._exists(course_id):
+            return 404, {}, NOT_FOUND
+        return 200, {}, self.cohort.course
+
+    def assignment(self, params, url, course_id, assignment_id):
+        if not self._exists(course_id, assignment_id):
+            return 404, {}, NOT_FOUND
+        return 200, {}, self.cohort.assignment
+
+    def submissions(self, params, url, course_id, assignment_id):
+        if not self._exists(course_id, assignment_id):
+            return 404, {}, NOT_FOUND
+        return self.paginate(self.cohort.submissions, params, url)
+
+    def multiple_submissions(self, params, url, course_id):
+        if not self._exists(course_id):
+            return 404, {}, NOT_FOUND
+
+        assignment_ids = params.get("assignment_ids[]")
+        submissions = [x for x in self.cohort.submissions if assignment_ids is None or str(x["assignment_id"]) in assignment_ids]
+
+        # Timestamps in the same format compare in order as strings
+        for field, since in [("graded_at", "graded_since"), ("submitted_at", "submitted_since")]:
+            if since in params:
+                submissions = [x for x in submissions if x[field] and x[field] >= params[since][0]]
+
+        return self.paginate(submissions, params, url)
+
+    def users(self, params, url, course_id):
+        if not self._exists(course_id):
+            return 404, {}, NOT_FOUND
+        # Graders are the only users with enrollments in a synthetic course
+        return self.paginate(self.cohort.graders, params, url)
+
+    def user(self, params, url, user_id):
+        for grader in self.cohort.graders:
+            if grader["id"] == user_id:
+                return 200, {}, grader
+        return 404, {}, NOT_FOUND
+
+    def graphql(self, request):
+        query = request.get("query", "")
+        variables = request.get("variables") or {}
+
+        if "submissionsConnection" not in query and "commentsConnection" in query:
+            for submission in self.cohort.submissions:
+                if str(submission["id"]) == str(variables.get("submissionId")):
+                    connection = self._graphql_comments(submission, query, variables.get("after"))
+                    return 200, {}, {"data": {"submission": {"commentsConnection": connection}}}
+            return 200, {}, {"data": {"submission": None}, "errors": [{"message": "submission not found"}]}
+
+        if str(self.cohort.assignment["id"]) != str(variables.get("assignmentId")):
+            return 200, {}, {"data": {"assignment": None}, "errors": [{"message": "assignment not found"}]}
+
+        if "submissionsConnection" in query:
+            submissions = self.cohort.submissions
+            since = variables.get("updatedSince")
+            if since:
+                submissions = [x for x in submissions if max(x["graded_at"] or "", x["submitted_at"] or "") >= since]
+
+            # The cursor is the offset of the next submission
+            start = int(variables.get("after") or 0)
+            stop = start + min(int(variables.get("first") or self.default_per_page), self.max_per_page)
+            connection = {
+                "pageInfo": {"hasNextPage": stop < len(submissions), "endCursor": str(stop)},
+                "nodes": [self._graphql_submission(x, query) for x in submissions[start:stop]],
+            }
+            return 200, {}, {"data": {"assignment": {"submissionsConnection": connection}}}
+
+        if "rubric" in query:
+            criteria = [{
+                "_id": x["id"],
+                "description": x["description"],
+                "points": x["points"],
+                "ratings": [{"_id": r["id"], "description": r["description"], "points": r["points"]} for r in x["ratings"]],
+            } for x in self.cohort.rubric]
+            return 200, {}, {"data": {"assignment": {"rubric": {"criteria": criteria}}}}
+
+        return 200, {}, {"errors": [{"message": "The stub doesn't answer this query"}]}
+
+    def _graphql_comments(self, submission, query, after=None):
+        comments = submission["submission_comments"]
+        if not re.search(r"allComments:\s*true", query):
+            comments = [x for x in comments if x.get("attempt", submission["attempt"]) == submission["attempt"]]
+
+        # The cursor is the offset of the next comment
+        start = int(after or 0)
+        stop = start + self.max_per_page
+        return {
+            "pageInfo": {"hasNextPage": stop < len(comments), "endCursor": str(stop)},
+            "nodes": [{"_id": str(x["id"]), "comment": x["comment"], "author": {"_id": str(x["author_id"])}} for x in comments[start:stop]],
+        }
+
+    def _graphql_submission(self, submission, query):
+        assessments = []
+        if submission["rubric_assessment"]:
+            grader = self.graders[submission["grader_id"]]
+            assessments.append({
+                "assessmentType": "grading",
+                "updatedAt": submission["graded_at"],
+                "assessor": {"_id": str(grader["id"]), "sortableName": grader["sortable_name"]},
+                "assessmentRatings": [
+                    {"_id": x["rating_id"], "points": x["points"], "comments": x["comments"], "criterion": {"_id": criterion_id}}
+                    for criterion_id, x in submission["rubric_assessment"].items()],
+            })
+
+        user = submission["user"]
+        return {
+            "_id": str(submission["id"]),
+            "attempt": submission["attempt"],
+            "state": submission["workflow_state"],
+            "score": submission["score"],
+            "submittedAt": submission["submitted_at"],
+            "gradedAt": submission["graded_at"],
+            "postedAt": submission["posted_at"],
+            "secondsLate": float(submission["seconds_late"]),
+            "graderId": str(submission["grader_id"]) if submission["grader_id"] is not None else None,
+            "user": {"_id": str(user["id"]), "sortableName": user["sortable_name"], "sisId": user["sis_user_id"]},
+            "attachments": [{"_id": str(x["id"]), "displayName": x["display_name"]} for x in submission["attachments"]],
+            "commentsConnection": self._graphql_comments(submission, query),
+            "rubricAssessmentsConnection": {"nodes": assessments},
+        }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Headers and body are written separately, so don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length).decode("utf-8") if length else None
+
+        with server.lock:
+            server.requests[url.path] += 1
+
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        headers = {"Content-Type": "application/json"}
+        if server.bucket is not None:
+            allowed, remaining = server.bucket.charge()
+            headers["X-Rate-Limit-Remaining"] = f"{remaining:.1f}"
+            headers["X-Request-Cost"] = f"{server.bucket.cost:.1f}"
+            if not allowed:
+                self._send(403, headers, b"403 Forbidden (Rate Limit Exceeded)")
+                return
+
+        if server.api is not None:
+            status, response_headers, body = server.api.respond(method, url.path, url.query, f"http://{self.headers['Host']}", request_body)
+            headers.update(response_headers)
+            body = json.dumps(body).encode("utf-8")
+
+            # Like Canvas, tag responses with an ETag and answer a matching If-None-Match with a 304
+            if status == 200:
+                headers["ETag"] = f'W/"{hashlib.md5(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == headers["ETag"]:
+                    with server.lock:
+                        server.not_modified += 1
+                    self._send(304, headers, b"")
+                    return
+
+            self._send(status, headers, body)
+            return
+
+        interaction = server.cassette.find(method, url.path, url.query, request_body) if server.cassette is not None else None
+        if interaction is None:
+            self._send(404, headers, json.dumps(NOT_FOUND).encode("utf-8"))
+            return
+
+        headers.update(interaction["headers"])
+        self._send(interaction["status"], headers, interaction["body"].encode("utf-8"))
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet
+        pass
+
+
+class StubServer:
+    """
+    Local HTTP server standing in for Canvas, for running the HTTP code paths offline.
+
+    Responses are replayed from a Cassette, or answered by a SyntheticAPI.
+    Every request can be delayed by latency seconds plus up to jitter more, and
+    metered by a LeakyBucket that adds Canvas' rate limit headers and refuses
+    requests once it is full. requests counts the requests made to each path.
+
+    Use as a context manager; the server runs on a background thread and its
+    address is available as url, so Canvas(server.url, token) talks to it.
+    Synthetic responses carry an ETag, and not_modified counts the requests
+    answered 304 Not Modified.
+    """
+
+    def __init__(self, cassette=None, host="127.0.0.1", port=0, api=None, latency=0, jitter=0, bucket=None):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.cassette = cassette
+        self.httpd.api = api
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.bucket = bucket
+        self.httpd.requests = Counter()
+        self.httpd.not_modified = 0
+        self.httpd.lock = threading.Lock()
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def not_modified(self):
+        return self.httpd.not_modified
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic Canvas responses on a local port.")
+    parser.add_argument("cassette", nargs="?", help="Path to a recorded cassette .json file")
+    parser.add_argument("--synthetic", default=None, help="Serve a synthetic cohort instead, as STUDENTSxGRADERS, e.g. 1000x20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many more seconds added at random")
+    parser.add_argument("--per-page", type=int, default=100, help="Largest page served. canvasapi asks for 100")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Size of the rate limit bucket, e.g. 700. Unlimited if not given")
+    parser.add_argument("--leak-rate", type=float, default=10, help="Rate limit units the bucket drains a second")
+    parser.add_argument("--cost", type=float, default=1.0, help="Rate limit units each request costs")
+    args = parser.parse_args()
+
+    if (args.cassette is None) == (args.synthetic is None):
+        parser.error("give either a cassette or --synthetic")
+
+    api = None
+    if args.synthetic:
+        from synthetic import SyntheticCohort
+
+        students, graders = [int(x) for x in args.synthetic.lower().split("x")]
+        api = SyntheticAPI(SyntheticCohort(students=students, graders=graders, seed=args.seed), max_per_page=args.per_page)
+
+    bucket = LeakyBucket(args.rate_limit, args.leak_rate, args.cost) if args.rate_limit else None
+    cassette = Cassette(args.cassette) if args.cassette else None
+
+    with StubServer(cassette, port=args.port, api=api, latency=args.latency, jitter=args.jitter, bucket=bucket) as server:
+        print(f"Serving {args.cassette or f'a synthetic cohort of {args.synthetic}'} at {server.url}")
+        if api is not None:
+            print(f"Course {api.cohort.course['id']}, assignment {api.cohort.assignment['id']}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print(f"{sum(server.requests.values())} requests" + (f", {bucket.throttled} throttled" if bucket else ""))
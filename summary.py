@@ -0,0 +1,197 @@
+import os
+
+import pandas as pd
+from docx import Document
+from docx.shared import Inches
+
+from aggregates import summary_tables
+from moderation import BOXPLOT_LABELS, SETTINGS_SHEET, grader_statistics, get_grade_bands, get_rules
+from plots import boxplot_path
+from rules import parse_issues
+
+
+def write_summary(fpath, df, results_df, words_df, criteria_df, figures=True, aggregates=None):
+    """
+    Writes the moderation summary document next to a moderated report.
+
+    Parameters:
+    fpath (str): Path of the moderated .xlsx report. Its boxplots must already be saved if figures is True.
+    df (DataFrame): The moderated report.
+    results_df (DataFrame): grader_statistics of 'score'.
+    words_df (DataFrame): grader_statistics of 'total_words'.
+    criteria_df (DataFrame): The criterion analysis.
+    figures (bool): Embed the score and word count boxplots.
+    aggregates (dict): The score band and moderation issue counts from summary_tables, computed if not given.
+    """
+    doc = Document()
+
+    # Add title
+    doc.add_heading(f'Moderation Summary: {fpath} ', level=0)
+
+    # Add credit
+    doc.add_paragraph("This moderation summary was generated using the Canvas Assignment Auto Moderator by R. Treharne. For more information, contact R.Treharne@liverpool.ac.uk")
+
+    if aggregates is None:
+        aggregates = summary_tables(df)
+
+    # Table header
+    doc.add_paragraph("Table 1: Score ranges and counts")
+    # Create a table to display the score ranges and counts
+    add_table(doc, aggregates["Score bands"])
+
+    # Table header
+    doc.add_paragraph("Table 2: Summary of Moderation issues")
+
+    # Create a table to display the moderation issues
+    add_table(doc, aggregates["Moderation issues"])
+
+
+
+    # Add the boxplot, unless moderation was run without plots
+    if figures:
+        doc.add_picture(boxplot_path(fpath, 'score'), width=Inches(5))
+
+        # Add figure caption
+        doc.add_paragraph(f'Figure 1: Boxplot of scores by grader. Red dots indicate individual scores. Green line indicates the global median score. * indicates significant differences between grader median scores and the global median score ({df["score"].median()}).')
+
+    # get graders with P-Value < 0.05
+    significant_graders = results_df[results_df["P-Value"] < 0.05]
+
+    # Format median and mean values to 2 decimal places
+    significant_graders["Median score"] = significant_graders["Median score"].map("{:.2f}".format)
+    significant_graders["Mean score"] = significant_graders["Mean score"].map("{:.2f}".format)
+
+    # Format P-Value to scientific notation
+    significant_graders["P-Value"] = significant_graders["P-Value"].map(lambda x: f"{x:.2e}")
+
+    # Start a new page
+    doc.add_page_break()
+
+    # Add table title
+    doc.add_paragraph(f'Table 2: Graders with significant differences in median scores compared to the global median score ({df['score'].median()}).')
+
+    # Add significatn_graders dataframe as table to document
+    t = doc.add_table(significant_graders.shape[0]+1, significant_graders.shape[1])
+
+    # add the header rows.
+    for j in range(significant_graders.shape[-1]):
+        t.cell(0,j).text = significant_graders.columns[j]
+
+    # add the rest of the data frame
+    for i in range(significant_graders.shape[0]):
+        for j in range(significant_graders.shape[-1]):
+            t.cell(i+1,j).text = str(significant_graders.values[i,j])
+
+    # Start a new page
+    doc.add_page_break()
+
+    # Add the boxplot, unless moderation was run without plots
+    if figures:
+        doc.add_picture(boxplot_path(fpath, 'total_words'), width=Inches(5))
+
+        # Add figure caption
+        doc.add_paragraph(f'Figure 2: Boxplot of total words (annotations + comments) by grader. Red dots indicate individual word counts (for single submission). Green line indicates the global median word count. * indicates significant differences between grader median word counts and the global median word count ({df['total_words'].median()}).')
+
+    # get graders with P-Value < 0.05
+    significant_graders_words = words_df[words_df["P-Value"] < 0.05]
+
+    # Format median and mean values to 2 decimal places
+    significant_graders_words["Median total_words"] = significant_graders_words["Median total_words"].map("{:.2f}".format)
+    significant_graders_words["Mean total_words"] = significant_graders_words["Mean total_words"].map("{:.2f}".format)
+
+    # Format P-Value to scientific notation
+    significant_graders_words["P-Value"] = significant_graders_words["P-Value"].map(lambda x: f"{x:.2e}")
+
+    # Start a new page
+    doc.add_page_break()
+
+    # Add table title
+    doc.add_paragraph(f'Table 3: Graders with significant differences in median word counts compared to the global median word count ({df['total_words'].median()}).')
+
+    # Add significatn_graders dataframe as table to document
+    t = doc.add_table(significant_graders_words.shape[0]+1, significant_graders_words.shape[1])
+
+    # add the header rows.
+    for j in range(significant_graders_words.shape[-1]):
+        t.cell(0,j).text = significant_graders_words.columns[j]
+
+    # add the rest of the data frame
+    
+    for i in range(significant_graders_words.shape[0]):
+
+        for j in range(significant_graders_words.shape[-1]):
+            t.cell(i+1,j).text = str(significant_graders_words.values[i,j])
+
+    # get criteria where a grader's scores differ significantly from everyone else's
+    significant_criteria = criteria_df[criteria_df["P-Value"] < 0.05].copy()
+
+    # Format median and mean values to 2 decimal places
+    significant_criteria["Median"] = significant_criteria["Median"].map("{:.2f}".format)
+    significant_criteria["Mean"] = significant_criteria["Mean"].map("{:.2f}".format)
+
+    # Format P-Value to scientific notation
+    significant_criteria["P-Value"] = significant_criteria["P-Value"].map(lambda x: f"{x:.2e}")
+
+    # Start a new page
+    doc.add_page_break()
+
+    # Add table title
+    doc.add_paragraph('Table 4: Graders with significant differences in median rubric criterion scores compared to all other graders.')
+
+    # Add significant_criteria dataframe as table to document
+    t = doc.add_table(significant_criteria.shape[0]+1, significant_criteria.shape[1])
+
+    # add the header rows.
+    for j in range(significant_criteria.shape[-1]):
+        t.cell(0,j).text = significant_criteria.columns[j]
+
+    # add the rest of the data frame
+    for i in range(significant_criteria.shape[0]):
+        for j in range(significant_criteria.shape[-1]):
+            t.cell(i+1,j).text = str(significant_criteria.values[i,j])
+
+    # Save the document
+    doc.save(fpath.replace("moderation_report.xlsx", "moderation_summary.docx"))
+
+
+def add_table(doc, frame):
+    """
+    Adds a data frame to the document as a table with a header row.
+    """
+    table = doc.add_table(rows=frame.shape[0] + 1, cols=frame.shape[1])
+    table.style = 'Table Grid'
+
+    # Add the headers
+    for j, column in enumerate(frame.columns):
+        table.cell(0, j).text = column
+
+    for i, row in enumerate(frame.itertuples(index=False)):
+        for j, value in enumerate(row):
+            table.cell(i + 1, j).text = str(value)
+
+    return table
+
+
+def summarise(fpath):
+    """
+    Rewrites the moderation summary for a report that has already been moderated,
+    without fetching or re-plotting anything.
+    """
+    df = pd.read_excel(fpath)
+    rules = get_rules()
+
+    # Reports moderated before the flags were saved only have the issue text
+    if 'moderation_flags' not in df.columns:
+        df['moderation_flags'] = parse_issues(df['moderation_issue'], rules)
+    criteria_df = pd.read_excel(fpath, sheet_name='Criterion analysis')
+
+    # Only embed charts drawn when this report was moderated
+    try:
+        settings = pd.read_excel(fpath, sheet_name=SETTINGS_SHEET).set_index('setting')['value']
+        figures = bool(settings.get('plots', False))
+    except ValueError:
+        # Reports moderated before the settings were saved
+        figures = all(os.path.exists(boxplot_path(fpath, x)) for x in BOXPLOT_LABELS)
+
+    write_summary(fpath, df, grader_statistics(df, 'score'), grader_statistics(df, 'total_words'), criteria_df, figures=figures, aggregates=summary_tables(df, get_grade_bands(), rules))
+    print(f"Moderation summary saved as {fpath.replace('moderation_report.xlsx', 'moderation_summary.docx')}")
@@ -0,0 +1,52 @@
+import datetime
+import json
+import os
+
+# Submission fields that change when a submission is resubmitted, regraded or posted
+FINGERPRINT_FIELDS = ["graded_at", "posted_at", "attempt", "workflow_state"]
+
+
+class SyncState:
+    """
+    What the last run fetched for one course/assignment.
+
+    Records the time of the last sync and a fingerprint of every submission
+    whose row was built. The next run only asks Canvas for submissions graded
+    or submitted since then, and only rebuilds rows whose fingerprint changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_sync = None
+        self.submissions = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.last_sync = state["last_sync"]
+            self.submissions = state["submissions"]
+
+    @staticmethod
+    def now():
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    @staticmethod
+    def fingerprint(submission):
+        return {field: getattr(submission, field, None) for field in FINGERPRINT_FIELDS}
+
+    def changed(self, submission):
+        # JSON object keys are always strings
+        return self.submissions.get(str(submission.user_id)) != self.fingerprint(submission)
+
+    def mark(self, submission):
+        self.submissions[str(submission.user_id)] = self.fingerprint(submission)
+
+    def reset(self):
+        self.last_sync = None
+        self.submissions = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_sync": self.last_sync, "submissions": self.submissions}, f)
+        os.replace(tmp_path, self.path)
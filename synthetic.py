@@ -0,0 +1,188 @@
+import random
+
+import requests
+
+# Words used to make up feedback text
+VOCABULARY = (
+    "good clear argument evidence structure referencing analysis discussion introduction conclusion "
+    "well written consider further detail critical support sources figure results method improve "
+    "excellent paragraph explain point develop the a of and to in this your is could more").split()
+
+GRADER_ID_START = 10000
+STUDENT_ID_START = 100000
+
+
+class SyntheticCohort:
+    """
+    A made up course, assignment, rubric, graders and submissions, shaped like
+    the Canvas API responses the tool reads.
+
+    Every student has an underlying ability and every grader a bias, so some
+    graders mark significantly higher or lower than the rest. A few submissions
+    are ungraded, have no feedback, or have a score that differs from their
+    rubric total. The same seed always gives the same cohort.
+
+    Parameters:
+    students (int): Number of submissions.
+    graders (int): Number of graders the submissions are shared between.
+    criteria (int): Number of rubric criteria, with five ratings each.
+    seed (int): Random seed.
+    """
+
+    def __init__(self, students=1000, graders=20, criteria=5, seed=0, course_id=1, assignment_id=1):
+        self.random = random.Random(seed)
+
+        self.course = {"id": course_id, "name": "Synthetic Course", "course_code": f"SYN{course_id}"}
+        self.rubric = self._rubric(criteria)
+        self.assignment = {
+            "id": assignment_id,
+            "course_id": course_id,
+            "name": f"Synthetic Assignment {assignment_id}",
+            "points_possible": 100,
+            "rubric": self.rubric,
+        }
+        self.graders = [
+            {"id": GRADER_ID_START + i, "name": f"Grader {i}", "sortable_name": f"Grader{i}, Synthetic"}
+            for i in range(graders)]
+        self.bias = {x["id"]: self.random.gauss(0, 0.4) for x in self.graders}
+        self.submissions = [self._submission(i) for i in range(students)]
+
+    def _rubric(self, criteria):
+        weight = 100 / criteria
+        return [{
+            "id": f"_{i}",
+            "description": f"Criterion {i + 1}",
+            "points": weight,
+            "ratings": [
+                {"id": f"_{i}_{j}", "description": f"Rating {j + 1}", "points": round(weight * fraction, 1)}
+                for j, fraction in enumerate([0.3, 0.45, 0.55, 0.65, 0.8])],
+        } for i in range(criteria)]
+
+    def _feedback(self, mean_words):
+        words = int(self.random.lognormvariate(0, 0.6) * mean_words)
+        return " ".join(self.random.choice(VOCABULARY) for _ in range(words))
+
+    def _submission(self, i):
+        rnd = self.random
+        user_id = STUDENT_ID_START + i
+        grader = rnd.choice(self.graders)
+        graded = rnd.random() > 0.03
+
+        submission = {
+            "id": user_id,
+            "user_id": user_id,
+            "assignment_id": self.assignment["id"],
+            "attempt": 1,
+            "submitted_at": "2024-01-10T12:00:00Z",
+            "seconds_late": 0 if rnd.random() > 0.1 else rnd.randint(60, 3 * 24 * 60 * 60),
+            "workflow_state": "graded" if graded else "submitted",
+            "graded_at": "2024-01-20T12:00:00Z" if graded else None,
+            "posted_at": "2024-01-25T12:00:00Z" if graded else None,
+            "grader_id": grader["id"] if graded else None,
+            "score": None,
+            "preview_url": f"/courses/{self.course['id']}/assignments/{self.assignment['id']}/submissions/{user_id}?preview=1",
+            "submission_type": "online_upload",
+            "attachments": [{
+                "id": user_id,
+                "display_name": f"essay_{user_id}.pdf",
+                "preview_url": f"/api/v1/canvadoc_session?blob=%7B%22attachment_id%22:{user_id}%7D",
+            }],
+            "user": {
+                "id": user_id,
+                "name": f"First{i} Last{i}",
+                "sortable_name": f"Last{i}, First{i}",
+                "sis_user_id": f"{200000000 + i}",
+            },
+            "submission_comments": [],
+            "rubric_assessment": {},
+        }
+        if not graded:
+            return submission
+
+        # Ratings follow the student's ability, shifted by the grader's bias
+        ability = rnd.gauss(2, 0.9) + self.bias[grader["id"]]
+        total = 0
+        for criterion in self.rubric:
+            j = min(4, max(0, round(ability + rnd.gauss(0, 0.7))))
+            rating = criterion["ratings"][j]
+            submission["rubric_assessment"][criterion["id"]] = {"rating_id": rating["id"], "points": rating["points"], "comments": ""}
+            total += rating["points"]
+
+        # Some final scores are adjusted away from the rubric total
+        if rnd.random() < 0.05:
+            total += rnd.choice([-5, -2, 2, 5])
+        submission["score"] = round(total, 1)
+
+        if rnd.random() > 0.08:
+            submission["submission_comments"] = [
+                {"id": user_id * 10 + k, "author_id": grader["id"], "comment": self._feedback(60), "created_at": "2024-01-20T12:00:00Z"}
+                for k in range(rnd.randint(1, 3))]
+
+        return submission
+
+
+class _Object:
+    def __init__(self, attributes):
+        self.__dict__.update(attributes)
+
+
+class SyntheticCanvas:
+    """
+    Stands in for canvasapi.Canvas over a SyntheticCohort, without any network.
+
+    Submissions are real canvasapi Submission objects built from the cohort's
+    JSON, so they look exactly like those from a live course.
+    """
+
+    def __init__(self, cohort):
+        self.cohort = cohort
+        self.requests = 0
+        # RateLimiter hooks into the requester's session
+        self._Canvas__requester = _Object({"_session": requests.Session()})
+
+    def get_course(self, course_id):
+        self.requests += 1
+        return _SyntheticCourse(self, self.cohort.course)
+
+    def get_user(self, user_id):
+        self.requests += 1
+        for grader in self.cohort.graders:
+            if grader["id"] == user_id:
+                return _Object(grader)
+
+        from canvasapi.exceptions import ResourceDoesNotExist
+        raise ResourceDoesNotExist("Not Found")
+
+
+class _SyntheticCourse(_Object):
+    def __init__(self, canvas, attributes):
+        super().__init__(attributes)
+        self._canvas = canvas
+
+    def get_assignment(self, assignment_id):
+        self._canvas.requests += 1
+        return _SyntheticAssignment(self._canvas, self._canvas.cohort.assignment)
+
+    def get_users(self, **kwargs):
+        self._canvas.requests += 1
+        return [_Object(x) for x in self._canvas.cohort.graders]
+
+    def get_multiple_submissions(self, **kwargs):
+        self._canvas.requests += 1
+        return _submissions(self._canvas.cohort)
+
+
+class _SyntheticAssignment(_Object):
+    def __init__(self, canvas, attributes):
+        super().__init__(attributes)
+        self._canvas = canvas
+
+    def get_submissions(self, **kwargs):
+        self._canvas.requests += 1
+        return _submissions(self._canvas.cohort)
+
+
+def _submissions(cohort):
+    from canvasapi.submission import Submission
+
+    return [Submission(None, x) for x in cohort.submissions]
@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every user writes their own config.py from sample.config.py. Tests run with
+# the default settings rather than whatever is in it
+config = types.ModuleType("config")
+config.CANVAS_URL = "http://127.0.0.1"
+config.CANVAS_TOKEN = "token"
+sys.modules["config"] = config
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import GradeBands, count_issues, summary_tables
+from rules import RULES, parse_issues
+
+# Scores on and either side of every band and borderline boundary
+SCORES = [0, 12.5, 37.99, 38, 39, 39.99, 40, 47.5, 48, 49.99, 50, 57, 58, 59.5, 60,
+          65, 67.99, 68, 69.99, 70, 85, 99.99, 100, np.nan]
+
+ISSUES = [
+    "",
+    "No written feedback, ",
+    "Final score is different to rubric total, No written feedback, ",
+    "Grader median score is significantly higher than global median, ",
+    "Grader median score is significantly lower than global median, Final score is different to rubric total, ",
+    "Grader median feedback word count is significantly lower than global median, No written feedback, ",
+    "Grader median score is significantly higher than global median, Grader median feedback word count is significantly higher than global median, ",
+    "",
+]
+
+
+def baseline_bands(df):
+    # The score ranges table as the summary used to fill it in, one range at a time
+    return [
+        ('Fail (<40)', len(df[df['score'] < 40])),
+        ('Borderline fail (38 - 40)', len(df[(df['score'] >= 38) & (df['score'] < 40)])),
+        ('Pass (40 - 50)', len(df[(df['score'] >= 40) & (df['score'] < 50)])),
+        ('Borderline pass/2.2 (48 - 50)', len(df[(df['score'] >= 48) & (df['score'] < 50)])),
+        ('2.2 (50 - 60)', len(df[(df['score'] >= 50) & (df['score'] < 60)])),
+        ('Borderline 2.2/2.1 (58 - 60)', len(df[(df['score'] >= 58) & (df['score'] < 60)])),
+        ('2.1 (60 - 70)', len(df[(df['score'] >= 60) & (df['score'] < 70)])),
+        ('Borderline 2.1/1st (68 - 70)', len(df[(df['score'] >= 68) & (df['score'] < 70)])),
+        ('1st (70 - 100)', len(df[(df['score'] >= 70) & (df['score'] <= 100)])),
+    ]
+
+
+def baseline_issues(df):
+    # The moderation issues table as the summary used to fill it in, by searching the issue text
+    def impacted(text):
+        return len(df[df['moderation_issue'].str.contains(text)])
+
+    return [
+        ('Grader median score is significantly lower than global median score', impacted("Grader median score is significantly lower")),
+        ('Grader median score is significantly higher than global median score', impacted("Grader median score is significantly higher")),
+        ('Grader median feedback word count is significantly lower than global median word count', impacted("Grader median feedback word count is significantly lower")),
+        ('Grader median feedback word count is significantly higher than global median word count', impacted("Grader median feedback word count is significantly higher")),
+        ('Final score is different to rubric total', impacted("Final score is different to rubric total")),
+        ('No written feedback', impacted("No written feedback")),
+        ('Total', len(df[df['moderation_issue'].str.len() > 5])),
+    ]
+
+
+def rows(table):
+    return list(table.itertuples(index=False, name=None))
+
+
+def test_band_counts_match_baseline():
+    df = pd.DataFrame({"score": SCORES})
+
+    assert rows(GradeBands().count(df["score"])) == baseline_bands(df)
+
+
+def test_band_counts_of_shuffled_scores():
+    scores = np.random.default_rng(0).uniform(0, 100, 1000).round(1)
+    df = pd.DataFrame({"score": scores})
+
+    assert rows(GradeBands().count(df["score"])) == baseline_bands(df)
+
+
+def test_issue_counts_match_baseline():
+    df = pd.DataFrame({"moderation_issue": ISSUES})
+
+    assert rows(count_issues(parse_issues(df["moderation_issue"], RULES), RULES)) == baseline_issues(df)
+
+
+def test_summary_tables():
+    df = pd.DataFrame({"score": SCORES[:len(ISSUES)], "moderation_issue": ISSUES})
+    df["moderation_flags"] = parse_issues(df["moderation_issue"], RULES)
+
+    tables = summary_tables(df)
+
+    assert rows(tables["Score bands"]) == baseline_bands(df)
+    assert rows(tables["Moderation issues"]) == baseline_issues(df)
+
+
+def test_custom_bands():
+    bands = GradeBands([("Fail", 0), ("Pass", 50)], borderline_width=5, max_score=80)
+
+    table = bands.count([10, 44.99, 45, 49, 50, 80, 81])
+
+    assert rows(table) == [("Fail (<50)", 4), ("Borderline fail (45 - 50)", 2), ("Pass (50 - 80)", 2)]
+
+
+@pytest.mark.parametrize("bands, width", [
+    ([("Pass", 40), ("Fail", 0)], 2),
+    ([("Fail", 0), ("Pass", 100)], 2),
+    ([("Fail", 0), ("Pass", 40), ("Merit", 42)], 5),
+])
+def test_invalid_bands(bands, width):
+    with pytest.raises(ValueError):
+        GradeBands(bands, borderline_width=width)
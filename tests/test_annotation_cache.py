@@ -0,0 +1,141 @@
+import glob
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+from canvasapi import Canvas
+
+import annotations
+from annotations import ANNOTATION_SELECTOR, HttpAnnotationClient, RenderTimes, ScrapeFailed
+from report import fetch_report
+from stub_server import StubServer, SyntheticAPI
+from synthetic import SyntheticCohort
+
+COHORT = SyntheticCohort(30, 3)
+FAILING = COHORT.submissions[3]
+
+
+class FakeAnnotationClient(HttpAnnotationClient):
+    # Answers from the SpeedGrader url alone, failing for the students in fail
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.scraped = []
+
+    def get_annotations(self, url):
+        user_id = int(url.split("student_id=")[1])
+        self.scraped.append(user_id)
+        if user_id in self.fail:
+            raise ScrapeFailed("DocViewer didn't answer")
+        return [{"author": "Grader", "comment": f"annotation for {user_id}", "type": "annotation"}]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def canvas(tmp_path, monkeypatch):
+    # Reports and caches are written under the working directory
+    monkeypatch.chdir(tmp_path)
+    with StubServer(api=SyntheticAPI(COHORT)) as server:
+        yield Canvas(server.url, "token"), server.url
+
+
+class FakeBrowser:
+    # SpeedGrader whose annotations never finish rendering for the students in stuck
+    def __init__(self, stuck):
+        self.stuck = set(stuck)
+        self.switch_to = self
+        self.user_id = None
+        self.loaded = []
+
+    def get(self, url):
+        self.user_id = int(url.split("student_id=")[1])
+        self.loaded.append(self.user_id)
+
+    def frame(self, name):
+        pass
+
+    def default_content(self):
+        pass
+
+    def find_elements(self, by, selector):
+        if self.user_id in self.stuck:
+            return []
+        return [object()]
+
+    @property
+    def page_source(self):
+        return (f'<div class="ScreenreaderAnnotation-author">Author: Grader</div>'
+                f'<div class="ScreenreaderAnnotation-root-comment">Comment: annotation for {self.user_id}</div>')
+
+
+class FakeBrowserSession:
+    # A logged in CanvasSession, without Chrome
+    def __init__(self, stuck=()):
+        self.lock = threading.Lock()
+        self.browser = FakeBrowser(stuck)
+
+    def close(self):
+        pass
+
+
+def sync(canvas, fail=(), session=None):
+    canvas, url = canvas
+    if session is None:
+        session = FakeAnnotationClient(fail)
+    report_path = fetch_report(canvas, url, 1, 1, annotations=True, session=session)
+
+    # Report rows are identified by the student's SIS id
+    report = pd.read_excel(report_path, dtype={"sis_user_id": str}).set_index("sis_user_id")
+    return session, report.loc[FAILING["user"]["sis_user_id"], "annotations"]
+
+
+def retry_now():
+    db = sqlite3.connect(glob.glob("**/*_annotations.sqlite", recursive=True)[0])
+    with db:
+        db.execute("UPDATE annotation_failures SET retry_after = 0")
+    db.close()
+
+
+def test_failed_scrape_is_retried_by_incremental_sync(canvas):
+    session, annotations = sync(canvas, fail=[FAILING["user_id"]])
+    assert FAILING["user_id"] in session.scraped
+    assert pd.isna(annotations)
+
+    retry_now()
+    session, annotations = sync(canvas)
+
+    # Nothing changed on Canvas, only the failed scrape is tried again
+    assert session.scraped == [FAILING["user_id"]]
+    assert annotations == f"annotation for {FAILING['user_id']}"
+
+
+def test_failed_scrape_waits_for_its_backoff(canvas):
+    sync(canvas, fail=[FAILING["user_id"]])
+
+    session, annotations = sync(canvas)
+
+    assert session.scraped == []
+    assert pd.isna(annotations)
+
+
+def test_timed_out_render_is_not_cached_and_is_retried(canvas, monkeypatch):
+    # Rendered annotations are read at once, without waiting for them to settle
+    monkeypatch.setattr(annotations, "_AnnotationsReady", lambda: lambda browser: bool(browser.find_elements(None, ANNOTATION_SELECTOR)))
+    monkeypatch.setattr(annotations, "render_times", RenderTimes(initial_timeout=0.5))
+
+    session, annotations_text = sync(canvas, session=FakeBrowserSession(stuck=[FAILING["user_id"]]))
+    assert FAILING["user_id"] in session.browser.loaded
+    # The timeout is recorded as a failure to retry, not cached as having no annotations
+    assert pd.isna(annotations_text)
+    db = sqlite3.connect(glob.glob("**/*_annotations.sqlite", recursive=True)[0])
+    assert db.execute("SELECT COUNT(*) FROM annotations WHERE user_id = ?", (FAILING["user_id"],)).fetchone() == (0,)
+    assert db.execute("SELECT failures FROM annotation_failures WHERE user_id = ?", (FAILING["user_id"],)).fetchone() == (1,)
+    db.close()
+
+    retry_now()
+    session, annotations_text = sync(canvas, session=FakeBrowserSession())
+
+    assert session.browser.loaded == [FAILING["user_id"]]
+    assert annotations_text == f"annotation for {FAILING['user_id']}"
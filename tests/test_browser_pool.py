@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import annotations
+from annotations import BrowserPool, ScrapeFailed
+
+
+class FakeBrowser:
+    def set_page_load_timeout(self, seconds):
+        pass
+
+
+class FakeSession:
+    # Stands in for a CanvasSession without starting Chrome
+    started = 0
+    fail_to_start = False
+
+    def __init__(self, cookies=None, base_url="http://127.0.0.1"):
+        if FakeSession.fail_to_start:
+            raise WebDriverException("chromedriver didn't start")
+        FakeSession.started += 1
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.browser = FakeBrowser()
+        self.crashed = False
+        self.closed = False
+
+    def get_cookies(self):
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+def scrape(session, url):
+    if session.closed:
+        raise AssertionError("scraped with a closed browser")
+    if session.crashed:
+        raise WebDriverException("chrome not reachable")
+    return [{"author": "Grader", "comment": url, "type": "annotation"}]
+
+
+@pytest.fixture(autouse=True)
+def fake_browsers(monkeypatch):
+    FakeSession.started = 0
+    FakeSession.fail_to_start = False
+    monkeypatch.setattr(annotations, "CanvasSession", FakeSession)
+    monkeypatch.setattr(annotations, "_scrape_annotations", scrape)
+
+
+def test_crashed_browser_is_replaced():
+    session = FakeSession()
+    pool = BrowserPool(session, size=1)
+    session.crashed = True
+
+    assert pool.get_annotations("url") == [{"author": "Grader", "comment": "url", "type": "annotation"}]
+    assert session.closed
+    assert FakeSession.started == 2
+
+
+def test_browser_that_cannot_be_replaced_is_not_reused():
+    session = FakeSession()
+    pool = BrowserPool(session, size=1)
+    session.crashed = True
+    FakeSession.fail_to_start = True
+
+    with pytest.raises(ScrapeFailed):
+        pool.get_annotations("url")
+    assert pool._idle.empty()
+
+    # The missing browser is started again when it is next needed
+    FakeSession.fail_to_start = False
+    assert pool.get_annotations("next") == [{"author": "Grader", "comment": "next", "type": "annotation"}]
+    assert pool._idle.qsize() == 1
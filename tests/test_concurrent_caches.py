@@ -0,0 +1,21 @@
+import pytest
+
+from annotation_cache import AnnotationCache
+from canvas_cache import ResponseCache
+from store import SubmissionStore
+
+# Longer than Python's default 5s, so batch workers writing to the same file wait rather than fail
+BUSY_TIMEOUT_MS = 30000
+
+
+@pytest.mark.parametrize("open_db", [
+    lambda path: ResponseCache(path),
+    lambda path: AnnotationCache(path, 1, 2),
+    lambda path: SubmissionStore(path, 1, 2, ["last_name"]),
+])
+def test_shared_databases_wait_for_other_writers(tmp_path, open_db):
+    db = open_db(str(tmp_path / "shared.sqlite"))
+    try:
+        assert db.db.execute("PRAGMA busy_timeout").fetchone()[0] >= BUSY_TIMEOUT_MS
+    finally:
+        db.close()
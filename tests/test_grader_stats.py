@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.stats as stats
+
+from grader_stats import one_vs_rest
+
+
+def cohort(sizes, values):
+    rng = np.random.default_rng(0)
+    graders = [f"Grader {i}" for i, size in enumerate(sizes) for _ in range(size)]
+    return pd.DataFrame({"grader": rng.permutation(graders), "score": values(rng, len(graders))})
+
+
+COHORTS = {
+    # Integer marks, so nearly every value is tied
+    "tied": cohort([40, 25, 60, 12], lambda rng, n: rng.integers(40, 75, n)),
+    # Few, untied scores, where scipy uses the exact distribution
+    "small": cohort([5, 3, 8, 6], lambda rng, n: rng.normal(60, 8, n)),
+    # A small grader alongside large ones, with ties
+    "small_tied": cohort([4, 30, 30], lambda rng, n: rng.integers(50, 60, n)),
+    "large": cohort([400, 350, 500, 250, 500], lambda rng, n: rng.normal(60, 10, n)),
+}
+
+
+@pytest.mark.parametrize("name", COHORTS)
+def test_one_vs_rest_matches_scipy(name):
+    df = COHORTS[name]
+
+    results = one_vs_rest(df, "score").set_index("Grader")
+
+    for grader, row in results.iterrows():
+        expected = stats.mannwhitneyu(df.loc[df["grader"] == grader, "score"], df.loc[df["grader"] != grader, "score"], alternative="two-sided")
+        assert row["U"] == pytest.approx(expected.statistic)
+        assert row["P-Value"] == pytest.approx(expected.pvalue, rel=1e-9, abs=1e-12)
+        assert row["Median score"] == df.loc[df["grader"] == grader, "score"].median()
+
+
+def test_grader_who_marked_everything_is_left_out():
+    df = pd.DataFrame({"grader": ["Smith, Jane"] * 5, "score": [50, 60, 70, 55, 65]})
+
+    assert one_vs_rest(df, "score").empty
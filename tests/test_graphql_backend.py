@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from canvasapi import Canvas
+
+import report
+from graders import GraderDirectory
+from graphql_backend import GraphQLSubmission
+from stub_server import StubServer, SyntheticAPI
+from synthetic import SyntheticCohort
+
+
+def resubmitted_cohort():
+    cohort = SyntheticCohort(40, 4)
+
+    # A resubmission keeps the comments left on the first attempt, and has more than a page of them
+    submission = next(x for x in cohort.submissions if x["submission_comments"])
+    submission["attempt"] = 2
+    for comment in submission["submission_comments"]:
+        comment["attempt"] = 1
+    submission["submission_comments"] += [
+        {"id": submission["id"] * 10 + 5 + k, "author_id": submission["grader_id"], "comment": f"Second attempt note {k}", "attempt": 2}
+        for k in range(4)]
+    return cohort, submission
+
+
+def build(canvas, url, backend, path, monkeypatch):
+    # A report resumes from any store already written, so each backend builds in its own directory
+    path.mkdir()
+    monkeypatch.chdir(path)
+
+    graders = GraderDirectory(canvas, 1)
+    submissions = report.get_submissions(canvas, 1, 1, backend=backend, graders=graders)
+    rubric = report.get_rubric(canvas, 1, 1, backend=backend)
+    fpath = report.build_report(canvas, 1, 1, report.get_headers(rubric, False), submissions, rubric, url, graders=graders)
+    return pd.read_excel(fpath, dtype={"sis_user_id": str})
+
+
+def test_rest_and_graphql_reports_match(tmp_path, monkeypatch):
+    cohort, resubmitted = resubmitted_cohort()
+
+    # Pages of two, so submissions and the resubmission's comments both span several pages
+    with StubServer(api=SyntheticAPI(cohort, max_per_page=2)) as server:
+        canvas = Canvas(server.url, "token")
+        rest = build(canvas, server.url, "rest", tmp_path / "rest", monkeypatch)
+        graphql = build(canvas, server.url, "graphql", tmp_path / "graphql", monkeypatch)
+
+        assert server.requests["/api/graphql"] > 20
+
+    pd.testing.assert_frame_equal(graphql, rest)
+
+    comments = rest.set_index("sis_user_id").loc[resubmitted["user"]["sis_user_id"], "comments"]
+    assert all(x["comment"] in comments for x in resubmitted["submission_comments"])
+
+
+def assessment(assessor_id, updated_at, points, assessment_type="grading"):
+    return {
+        "assessmentType": assessment_type,
+        "updatedAt": updated_at,
+        "assessor": {"_id": str(assessor_id), "sortableName": f"Grader {assessor_id}"},
+        "assessmentRatings": [{"_id": "r1", "points": points, "comments": "", "criterion": {"_id": "_1"}}],
+    }
+
+
+@pytest.mark.parametrize("order", [[0, 1, 2], [2, 1, 0], [1, 2, 0]])
+def test_latest_grading_assessment_is_used(order):
+    assessments = [
+        assessment(1, "2024-01-20T12:00:00Z", 3),
+        # Regraded later, in a time zone behind UTC
+        assessment(2, "2024-01-21T08:00:00-07:00", 4),
+        assessment(3, "2024-01-22T12:00:00Z", 1, assessment_type="peer_review"),
+    ]
+    node = {"_id": "1", "user": {"_id": "1"}, "rubricAssessmentsConnection": {"nodes": [assessments[i] for i in order]}}
+
+    submission = GraphQLSubmission(node)
+
+    assert submission.assessor_id == 2
+    assert submission.rubric_assessment["_1"]["points"] == 4
+
+
+def test_submission_without_grading_assessment():
+    node = {"_id": "1", "user": {"_id": "1"}, "rubricAssessmentsConnection": {"nodes": [assessment(3, "2024-01-22T12:00:00Z", 1, "self_assessment")]}}
+
+    submission = GraphQLSubmission(node)
+
+    assert submission.rubric_assessment == {}
+    assert submission.assessor_id is None
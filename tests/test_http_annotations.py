@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from annotations import HttpAnnotationClient, ScrapeFailed, parse_speedgrader_annotations
+from stub_server import Cassette, StubServer
+
+SPEEDGRADER_URL = "/courses/1/gradebook/speed_grader?assignment_id=2&student_id=3"
+
+# One document's annotations, as DocViewer's API returns them
+ANNOTATIONS = [
+    {"user_name": "Smith, Jane", "contents": "Good use of sources"},
+    {"user_name": "Smith, Jane", "contents": "  Cite the page number  "},
+    # Highlights without a comment aren't listed for screen readers
+    {"user_name": "Smith, Jane", "contents": ""},
+    {"user_name": "Jones, Ali", "contents": "Agreed, well argued"},
+]
+
+# The same annotations as SpeedGrader lists them for screen readers once rendered
+SPEEDGRADER_HTML = "".join(
+    f'<div class="ScreenreaderAnnotation-author">Author: {x["user_name"]}</div>'
+    f'<div class="ScreenreaderAnnotation-root-comment">Comment: {x["contents"]}</div>'
+    for x in ANNOTATIONS if x["contents"].strip())
+
+
+def interaction(path, body, status=200, headers=None):
+    return {"method": "GET", "path": path, "query": "", "request_body": None,
+            "status": status, "headers": headers or {}, "body": body}
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    path = tmp_path / "docviewer.json"
+    path.write_text(json.dumps([
+        interaction("/api/v1/courses/1/assignments/2/submissions/3",
+                    "while(1);" + json.dumps({"attachments": [{"id": 5, "preview_url": "/api/v1/canvadoc_session"}]})),
+        interaction("/api/v1/canvadoc_session", "", status=302, headers={"Location": "/1/sessions/abc/view"}),
+        interaction("/1/sessions/abc/view", "<html></html>", headers={"Content-Type": "text/html"}),
+        interaction("/1/sessions/abc/annotations", json.dumps({"data": ANNOTATIONS})),
+    ]))
+    return Cassette(str(path))
+
+
+def test_http_annotations_match_speedgrader(cassette):
+    with StubServer(cassette=cassette) as server:
+        client = HttpAnnotationClient([{"name": "canvas_session", "value": "x"}], base_url=server.url)
+        annotations = client.get_annotations(server.url + SPEEDGRADER_URL)
+        client.close()
+
+    assert annotations == parse_speedgrader_annotations(SPEEDGRADER_HTML)
+    assert [(x["author"], x["comment"]) for x in annotations] == [
+        ("Smith, Jane", "Good use of sources"),
+        ("Smith, Jane", "Cite the page number"),
+        ("Jones, Ali", "Agreed, well argued"),
+    ]
+
+
+def test_missing_docviewer_session_fails_the_scrape(cassette):
+    cassette.interactions = cassette.interactions[:3]
+    with StubServer(cassette=cassette) as server:
+        client = HttpAnnotationClient([], base_url=server.url)
+        with pytest.raises(ScrapeFailed):
+            client.get_annotations(server.url + SPEEDGRADER_URL)
+        client.close()
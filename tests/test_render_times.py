@@ -0,0 +1,43 @@
+from annotations import ANNOTATION_SELECTOR, RenderTimes, _AnnotationsReady
+
+
+class FakeBrowser:
+    # A document whose annotations render one poll at a time
+    def __init__(self, counts):
+        self.counts = list(counts)
+
+    def find_elements(self, by, selector):
+        count = self.counts.pop(0) if len(self.counts) > 1 else self.counts[0]
+        if selector == ANNOTATION_SELECTOR:
+            return [object()] * count
+        # The document is showing
+        return [object()]
+
+
+def test_annotations_ready_only_after_settle_window(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("annotations.time.time", lambda: clock[0])
+    ready = _AnnotationsReady(settle=1.0)
+    browser = FakeBrowser([2, 2, 3, 3, 3, 3])
+
+    results = []
+    for _ in range(6):
+        results.append(ready(browser))
+        clock[0] += 0.25
+
+    # Two polls seeing the same count aren't enough
+    assert results[:5] == [False] * 5
+
+    clock[0] += 1.0
+    assert ready(browser)
+
+
+def test_timeouts_raise_the_timeout_again():
+    times = RenderTimes(initial_timeout=15, min_timeout=5, max_timeout=60, min_samples=5)
+    for _ in range(20):
+        times.record_render(1.0)
+    assert times.timeout() == 5
+
+    for _ in range(5):
+        times.record_timeout(times.timeout())
+    assert times.timeout() > 5
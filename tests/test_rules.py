@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rules import RULES, Rule, apply_rules, parse_issues, render_issues
+
+
+@pytest.fixture
+def report():
+    # Four graders: A marks high and writes a lot, B marks low, C writes little, D is unremarkable
+    df = pd.DataFrame({
+        "grader": ["A", "A", "B", "B", "C", "C", "D", "D"],
+        "score": [80, 75, 40, 45, 60, 62, 58, 61],
+        "SCORE_Clarity": [40, 35, 20, 25, 30, 31, 29, 30],
+        "SCORE_Evidence": [40, 40, 20, 25, 30, 31, 29, 30],
+        "total_words": [120, 90, 110, 0, 0, 5, 100, 80],
+    })
+    context = {
+        "rubric_total": df.filter(like="SCORE").sum(axis=1),
+        "score_stats": pd.DataFrame({
+            "Grader": ["B", "D", "C", "A"], "Median score": [42.5, 59.5, 61, 77.5], "P-Value": [0.01, 0.6, 0.4, 0.02]}),
+        "total_words_stats": pd.DataFrame({
+            "Grader": ["C", "B", "D", "A"], "Median total_words": [2.5, 55, 90, 105], "P-Value": [0.03, 0.7, 0.5, 0.04]}),
+    }
+    return df, context
+
+
+def baseline_issues(df, context):
+    # Issue text as moderation used to build it, appending to the column one check at a time
+    df = df.assign(moderation_issue="")
+
+    for label, text in [("score", "score"), ("total_words", "feedback word count")]:
+        stats = context[f"{label}_stats"]
+        for grader in stats[stats["P-Value"] < 0.05]["Grader"]:
+            median = stats[stats["Grader"] == grader][f"Median {label}"].values[0]
+            if median > df[label].median():
+                df.loc[df["grader"] == grader, "moderation_issue"] += f"Grader median {text} is significantly higher than global median, "
+            else:
+                df.loc[df["grader"] == grader, "moderation_issue"] += f"Grader median {text} is significantly lower than global median, "
+
+    df.loc[df.filter(like="SCORE").sum(axis=1) != df["score"], "moderation_issue"] += "Final score is different to rubric total, "
+    df.loc[df["total_words"] == 0, "moderation_issue"] += "No written feedback, "
+
+    return df["moderation_issue"]
+
+
+def test_rendered_issues_match_baseline(report):
+    df, context = report
+
+    issues = render_issues(apply_rules(df, RULES, context), RULES)
+
+    assert list(issues) == list(baseline_issues(df, context))
+    # Every check fired somewhere, so the comparison covers them all
+    assert all(rule.text in "".join(issues) for rule in RULES)
+
+
+def test_issues_parse_back_to_flags(report):
+    df, context = report
+    flags = apply_rules(df, RULES, context)
+
+    assert list(parse_issues(render_issues(flags, RULES), RULES)) == list(flags)
+
+
+def test_no_issues_renders_empty(report):
+    df, context = report
+
+    assert list(render_issues(np.zeros(len(df), dtype=np.int64), RULES)) == [""] * len(df)
+
+
+def flag_row(n):
+    # Rule i flags only row i
+    return [Rule(f"Issue {i}", lambda df, context, i=i: df.index == i) for i in range(n)]
+
+
+def test_63_rules_fit_in_the_flags():
+    rules = flag_row(63)
+    df = pd.DataFrame(index=range(63))
+
+    flags = apply_rules(df, rules, {})
+
+    assert flags.dtype == np.int64
+    assert (flags > 0).all()
+    assert flags[62] == 1 << 62
+    assert list(render_issues(flags, rules)) == [f"Issue {i}, " for i in range(63)]
+
+
+def test_64_rules_are_refused():
+    with pytest.raises(ValueError):
+        apply_rules(pd.DataFrame(index=range(1)), flag_row(64), {})
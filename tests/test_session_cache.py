@@ -0,0 +1,27 @@
+import requests
+
+from utils import save_session_cookies, saved_session
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_saved_login_is_checked_against_configured_canvas(tmp_path, monkeypatch):
+    path = str(tmp_path / "canvas_session.json")
+    save_session_cookies([{"name": "canvas_session", "value": "abc", "domain": "canvas.example.edu"}], path)
+
+    requested = []
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kwargs: requested.append(url) or FakeResponse(200))
+
+    assert saved_session(path, "https://canvas.example.edu/") == [{"name": "canvas_session", "value": "abc", "domain": "canvas.example.edu"}]
+    assert requested == ["https://canvas.example.edu/api/v1/users/self"]
+
+
+def test_expired_login_is_not_reused(tmp_path, monkeypatch):
+    path = str(tmp_path / "canvas_session.json")
+    save_session_cookies([{"name": "canvas_session", "value": "abc"}], path)
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, **kwargs: FakeResponse(302))
+
+    assert saved_session(path, "https://canvas.example.edu") is None
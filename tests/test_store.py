@@ -0,0 +1,185 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import report
+from graders import GraderDirectory
+from store import SubmissionStore, count_words, feedback_path, load_report
+from synthetic import SyntheticCanvas, SyntheticCohort
+
+HEADERS = ["last_name", "first_name", "sis_user_id", "score", "grader", "comments", "url",
+           "RATING_Clarity", "RATING_Evidence", "SCORE_Clarity", "SCORE_Evidence"]
+
+
+def row(name, score, comments="Well argued"):
+    return {"last_name": name, "first_name": "Sam", "sis_user_id": f"2000{score}", "score": score, "grader": "Smith, Jane",
+            "comments": comments, "url": "u", "RATING_Clarity": "Good", "RATING_Evidence": "", "SCORE_Clarity": 3.0, "SCORE_Evidence": score - 3.0}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with SubmissionStore(str(tmp_path / "moderation.sqlite"), 1, 2, HEADERS, criteria=["_1", "_2"]) as store:
+        yield store
+
+
+def test_rows_read_back_as_written(store):
+    store.put(11, row("Adams", 7))
+    store.put(12, row("Baker", 9, comments=""))
+
+    df = store.to_frame()
+
+    assert list(df.columns) == HEADERS
+    assert list(df["last_name"]) == ["Adams", "Baker"]
+    assert list(df["SCORE_Evidence"]) == [4.0, 6.0]
+    # Empty cells read back as missing, as they would from the .xlsx
+    assert pd.isna(df.loc[1, "comments"])
+    assert pd.isna(df.loc[0, "RATING_Evidence"])
+
+
+def test_rebuilt_row_keeps_its_place(store):
+    store.put(11, row("Adams", 7))
+    store.put(12, row("Baker", 9))
+    store.put(11, row("Adams", 8))
+
+    df = store.to_frame()
+    assert list(df["last_name"]) == ["Adams", "Baker"]
+    assert list(df["score"]) == [8, 9]
+
+
+def test_export_matches_store(store, tmp_path):
+    store.put(11, row("Adams", 7))
+    store.put(12, row("Baker", 9))
+    fpath = str(tmp_path / "Essay_moderation_report.xlsx")
+
+    store.export(fpath)
+
+    pd.testing.assert_frame_equal(pd.read_excel(fpath, dtype={"sis_user_id": str}), store.to_frame(), check_dtype=False)
+
+
+def test_ratings_are_keyed_by_criterion_id(store):
+    store.put(11, row("Adams", 7))
+
+    keys = store.db.execute("SELECT criterion_id, criterion FROM rubric_assessments ORDER BY criterion_id").fetchall()
+    assert keys == [("_1", "Clarity"), ("_2", "Evidence")]
+
+
+def test_criteria_sharing_a_description(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cohort = SyntheticCohort(10, 2, criteria=3)
+    for criterion in cohort.rubric[1:]:
+        criterion["description"] = "Structure"
+    canvas = SyntheticCanvas(cohort)
+
+    headers = report.get_headers(cohort.rubric, False)
+    assert headers[-3:] == ["SCORE_Criterion 1", "SCORE_Structure", "SCORE_Structure (2)"]
+
+    fpath = report.build_report(canvas, 1, 1, headers, report.get_submissions(canvas, 1, 1), cohort.rubric, "u", graders=GraderDirectory(canvas, 1))
+
+    df = pd.read_excel(fpath)
+    scores = [x["rubric_assessment"] for x in cohort.submissions]
+    assert list(df["SCORE_Structure (2)"].fillna(-1)) == [x[cohort.rubric[2]["id"]]["points"] if x else -1 for x in scores]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FailingGraders(GraderDirectory):
+    # Stops the run part way through, as a crash would
+    def __init__(self, canvas, course_id, fail_after):
+        super().__init__(canvas, course_id)
+        self.lookups = 0
+        self.fail_after = fail_after
+
+    def get_name(self, grader_id):
+        self.lookups += 1
+        if self.lookups > self.fail_after:
+            raise Interrupted()
+        return super().get_name(grader_id)
+
+
+def test_interrupted_run_resumes_from_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cohort = SyntheticCohort(20, 2)
+    canvas = SyntheticCanvas(cohort)
+    rubric = report.get_rubric(canvas, 1, 1)
+    headers = report.get_headers(rubric, False)
+
+    with pytest.raises(Interrupted):
+        report.build_report(canvas, 1, 1, headers, report.get_submissions(canvas, 1, 1), rubric, "u", graders=FailingGraders(canvas, 1, 12))
+
+    store_path = report.get_report_path(canvas, 1, 1).replace("moderation_report.xlsx", "moderation.sqlite")
+    assert sqlite3.connect(store_path).execute("SELECT COUNT(*) FROM submissions").fetchone() == (12,)
+
+    graders = FailingGraders(canvas, 1, 100)
+    fpath = report.build_report(canvas, 1, 1, headers, report.get_submissions(canvas, 1, 1), rubric, "u", graders=graders)
+
+    # Only the rows the first run didn't store are built again
+    assert graders.lookups == 8
+    df = pd.read_excel(fpath, dtype={"sis_user_id": str})
+    assert list(df["sis_user_id"]) == [x["user"]["sis_user_id"] for x in cohort.submissions]
+
+
+def test_store_written_before_criterion_ids_is_migrated(tmp_path):
+    path = str(tmp_path / "moderation.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript(
+        "CREATE TABLE rubric_assessments (course_id INTEGER NOT NULL, assignment_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+        "criterion TEXT NOT NULL, rating TEXT, points REAL, PRIMARY KEY (course_id, assignment_id, user_id, criterion));"
+        "CREATE INDEX rubric_assessments_criterion ON rubric_assessments (course_id, assignment_id, criterion);"
+        "INSERT INTO rubric_assessments VALUES (1, 2, 11, 'Clarity', 'Good', 3);")
+    db.close()
+
+    with SubmissionStore(path, 1, 2, HEADERS) as store:
+        assert store.db.execute("SELECT criterion_id, criterion, points FROM rubric_assessments").fetchall() == [("Clarity", "Clarity", 3.0)]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "one", "Well argued,  but\tcite\nsources.", "non\u00a0breaking\u2003spaces", " trailing "])
+def test_count_words_matches_split(text):
+    assert count_words(text) == len(text.split())
+
+
+@pytest.mark.parametrize("value", [None, float("nan"), 3])
+def test_count_words_of_missing_text(value):
+    assert count_words(value) == 0
+
+
+def test_compact_export_moves_feedback_to_side_file(store, tmp_path):
+    store.put(11, row("Adams", 7, comments="Clear and well argued"))
+    store.put(12, row("Baker", 9, comments=""))
+    fpath = str(tmp_path / "Essay_moderation_report.xlsx")
+
+    store.export(fpath, compact=True)
+
+    df = pd.read_excel(fpath)
+    assert "comments" not in df.columns
+    assert list(df["user_id"]) == [11, 12]
+    assert list(df["total_comments_words"]) == [4, 0]
+
+    feedback = pd.read_csv(feedback_path(fpath), index_col="user_id")
+    assert feedback.loc[11, "comments"] == "Clear and well argued"
+
+
+def test_compact_load_keeps_word_counts(tmp_path):
+    fpath = str(tmp_path / "Essay_moderation_report.xlsx")
+    with SubmissionStore(str(tmp_path / "Essay_moderation.sqlite"), 1, 2, HEADERS) as store:
+        store.put(11, row("Adams", 7, comments="Clear and well argued"))
+        store.put(12, row("Baker", 9, comments="Good"))
+        store.export(fpath)
+
+    full = load_report(fpath)
+    compact = load_report(fpath, compact=True)
+
+    assert "comments" not in compact.columns
+    assert list(compact["total_comments_words"]) == list(full["total_comments_words"]) == [4, 1]
+
+
+def test_compact_load_of_report_without_store(tmp_path):
+    fpath = str(tmp_path / "Essay_moderation_report.xlsx")
+    pd.DataFrame([row("Adams", 7, comments="Clear and well argued")]).to_excel(fpath, index=False)
+
+    df = load_report(fpath, compact=True)
+
+    assert "comments" not in df.columns
+    assert list(df["total_comments_words"]) == [4]
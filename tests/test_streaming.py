@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+from canvasapi import Canvas
+from canvasapi.paginated_list import PaginatedList
+
+from stub_server import StubServer, SyntheticAPI
+from streaming import SubmissionStream, iter_pages
+from synthetic import SyntheticCohort
+
+COHORT = SyntheticCohort(45, 3)
+
+
+@pytest.fixture(scope="module")
+def canvas():
+    # Pages of 10, so the cohort spans five of them
+    with StubServer(api=SyntheticAPI(COHORT, max_per_page=10)) as server:
+        yield Canvas(server.url, "token")
+
+
+def get_submissions(canvas):
+    return canvas.get_course(1).get_assignment(1).get_submissions(per_page=100)
+
+
+def test_paginated_list_has_the_private_paging_api():
+    # iter_pages falls back to keeping every page if canvasapi drops these
+    assert hasattr(PaginatedList, "_get_next_page")
+    assert hasattr(PaginatedList, "_has_next")
+
+
+def test_iter_pages_of_paginated_list(canvas):
+    submissions = get_submissions(canvas)
+
+    pages = list(iter_pages(submissions))
+
+    assert [len(x) for x in pages] == [10, 10, 10, 10, 5]
+    assert [x.user_id for page in pages for x in page] == [x["user_id"] for x in COHORT.submissions]
+    # The pages were requested directly, so the list kept none of them
+    assert submissions._elements == []
+
+
+def test_iter_pages_without_private_api(canvas):
+    class PublicList:
+        # A paginated list that can only be iterated
+        def __init__(self, items):
+            self.items = items
+
+        def __iter__(self):
+            return iter(self.items)
+
+    pages = list(iter_pages(PublicList(get_submissions(canvas)), page_size=20))
+
+    assert [len(x) for x in pages] == [20, 20, 5]
+
+
+def test_iter_pages_of_generator():
+    assert list(iter_pages(iter(range(7)), page_size=3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_pages([], page_size=3)) == []
+
+
+def test_stream_yields_every_submission(canvas):
+    stream = SubmissionStream(iter_pages(get_submissions(canvas)))
+
+    assert [x.user_id for x in stream] == [x["user_id"] for x in COHORT.submissions]
+    assert not stream._thread.is_alive()
+
+
+class CountingPages:
+    # Pages of page_size numbers, counting how many the producer has taken
+    def __init__(self, pages, page_size=3, fail_at=None):
+        self.pages = pages
+        self.page_size = page_size
+        self.fail_at = fail_at
+        self.taken = 0
+
+    def __iter__(self):
+        for i in range(self.pages):
+            if i == self.fail_at:
+                raise ConnectionError("Canvas went away")
+            self.taken += 1
+            yield list(range(i * self.page_size, (i + 1) * self.page_size))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_stream_fetches_a_bounded_number_of_pages_ahead():
+    pages = CountingPages(100)
+    stream = SubmissionStream(pages, prefetch=2)
+    submissions = iter(stream)
+
+    assert next(submissions) == 0
+    time.sleep(0.3)
+
+    # The page being read, two waiting in the queue and one the producer is blocked on
+    assert pages.taken <= 4
+
+    assert next(submissions) == 1
+    stream.close()
+
+
+def test_stream_raises_fetch_errors():
+    stream = SubmissionStream(CountingPages(5, fail_at=2))
+    submissions = []
+
+    with pytest.raises(ConnectionError):
+        for x in stream:
+            submissions.append(x)
+
+    # Everything fetched before the error is still built
+    assert submissions == list(range(6))
+    assert not stream._thread.is_alive()
+
+
+def test_stream_stops_fetching_when_closed_early():
+    pages = CountingPages(100)
+    stream = SubmissionStream(pages, prefetch=1)
+
+    for x in stream:
+        if x == 4:
+            break
+
+    # Leaving the loop closes the stream and joins the producer
+    wait_for(lambda: not stream._thread.is_alive())
+    assert not stream._thread.is_alive()
+    assert pages.taken < 100
+
+
+def test_closing_iteration_releases_a_blocked_producer():
+    started = threading.Event()
+
+    def pages():
+        yield [1, 2]
+        started.set()
+        yield [3]
+
+    stream = SubmissionStream(pages(), prefetch=1)
+    submissions = iter(stream)
+    assert next(submissions) == 1
+
+    started.wait(5)
+    submissions.close()
+
+    assert not stream._thread.is_alive()
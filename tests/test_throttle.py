@@ -0,0 +1,32 @@
+import time
+
+from throttle import RateLimiter
+
+
+class Response:
+    def __init__(self, remaining):
+        self.headers = {"X-Rate-Limit-Remaining": str(remaining)}
+
+
+def test_burst_of_low_responses_halves_limit_once():
+    limiter = RateLimiter(16, cooldown=0.2)
+
+    # Responses to requests already in flight all report the same low bucket
+    for _ in range(10):
+        limiter.observe(Response(100))
+    assert limiter.limit == 8
+
+    time.sleep(0.25)
+    limiter.observe(Response(100))
+    assert limiter.limit == 4
+
+
+def test_limit_recovers_with_quota():
+    limiter = RateLimiter(4, cooldown=0)
+    limiter.observe(Response(100))
+    limiter.observe(Response(100))
+    assert limiter.limit == 1
+
+    for _ in range(5):
+        limiter.observe(Response(600))
+    assert limiter.limit == 4
@@ -0,0 +1,100 @@
+from canvasapi.exceptions import Forbidden, RateLimitExceeded
+import threading
+import time
+
+from tracing import tracer
+
+
+def is_rate_limited(error):
+    # Canvas signals throttling with a 403 "Rate Limit Exceeded", newer canvasapi raises a 429 error
+    return isinstance(error, RateLimitExceeded) or (isinstance(error, Forbidden) and "Rate Limit Exceeded" in str(error))
+
+
+class RateLimiter:
+    """
+    Adaptive cap on the number of rows being built at once.
+
+    Canvas meters API use with a leaky bucket and reports the quota left after
+    each request in the X-Rate-Limit-Remaining header, and what the request
+    cost in X-Request-Cost. The limiter watches those headers on every response.
+    While plenty of quota remains the concurrency limit creeps back up to
+    max_workers. When the bucket runs low the limit is halved, at most once per
+    cooldown so a burst of responses to requests already in flight only counts
+    once, down to a single worker that waits for the bucket to drain before
+    each call.
+    """
+
+    def __init__(self, max_workers, low_water=150, high_water=400, cooldown=1.0, retries=5):
+        self.max_workers = max_workers
+        self.limit = max_workers
+        self.low_water = low_water
+        self.high_water = high_water
+        self.cooldown = cooldown
+        self.retries = retries
+        self.remaining = None
+        self.cost = None
+        self._active = 0
+        self._halved_at = None
+        self._cond = threading.Condition()
+
+    def attach(self, canvas):
+        # canvasapi doesn't expose response headers, so observe them on its requests session
+        canvas._Canvas__requester._session.hooks["response"].append(self.observe)
+
+    def observe(self, response, *args, **kwargs):
+        remaining = response.headers.get("X-Rate-Limit-Remaining")
+        if remaining is None:
+            return
+
+        with self._cond:
+            self.remaining = float(remaining)
+            cost = response.headers.get("X-Request-Cost")
+            if cost is not None:
+                self.cost = float(cost)
+
+            if self.remaining < self.low_water:
+                now = time.monotonic()
+                if self._halved_at is None or now - self._halved_at >= self.cooldown:
+                    self.limit = max(1, self.limit // 2)
+                    self._halved_at = now
+            elif self.remaining > self.high_water and self.limit < self.max_workers:
+                self.limit += 1
+            self._cond.notify_all()
+
+    def throttled(self):
+        # Canvas has refused a request, drop to one worker and let the bucket drain
+        with self._cond:
+            self.limit = 1
+            self.remaining = 0
+        tracer.sleep(self.cooldown, "throttle_sleep")
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Calls fn once a worker slot is free, retrying it if Canvas throttles the request.
+        """
+        for attempt in range(self.retries + 1):
+            with self:
+                try:
+                    return fn(*args, **kwargs)
+                except (Forbidden, RateLimitExceeded) as e:
+                    if not is_rate_limited(e) or attempt == self.retries:
+                        raise
+            tracer.count("retries")
+            self.throttled()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+            low = self.remaining is not None and self.remaining < self.low_water
+
+        if low:
+            tracer.sleep(self.cooldown, "throttle_sleep")
+
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
@@ -0,0 +1,174 @@
+from collections import Counter
+from contextlib import nullcontext
+import atexit
+import json
+import os
+import threading
+import time
+
+_NOT_TRACING = nullcontext()
+
+
+class Tracer:
+    """
+    Records where a run spends its time.
+
+    Stages are timed with span(), which records the wall time of every call
+    along with its thread, and counters such as API calls, bytes transferred,
+    retries and time spent sleeping are added up with count(). Attach the
+    tracer to a requests session to count every API call made on it.
+
+    The tracer does nothing until enable() is called, so instrumented code
+    costs next to nothing on a normal run. Once enabled the profile is saved
+    when the program exits: a JSON summary per stage and counter, a text
+    table on the console and, optionally, a Chrome trace (chrome://tracing or
+    https://ui.perfetto.dev) showing every span on its thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.chrome_trace = False
+        self.spans = []
+        self.counters = Counter()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def enable(self, path, chrome_trace=False):
+        """
+        Starts tracing and saves the profile to path when the program exits.
+        """
+        self.enabled = True
+        self.path = path
+        self.chrome_trace = chrome_trace
+        self.started = time.perf_counter()
+        atexit.register(self.save)
+
+    def span(self, name, **args):
+        """
+        Times a stage, for use as a context manager.
+        """
+        if not self.enabled:
+            return _NOT_TRACING
+        return _Span(self, name, args)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += value
+
+    def sleep(self, seconds, reason="sleep"):
+        """
+        time.sleep that records how long was spent sleeping, and why.
+        """
+        self.count(f"{reason}_seconds", seconds)
+        time.sleep(seconds)
+
+    def attach(self, session, prefix="api"):
+        """
+        Counts the calls, bytes and response time of every request made on a requests session.
+        """
+        if not self.enabled or session in self._sessions:
+            return
+
+        def observe(response, *args, **kwargs):
+            self.count(f"{prefix}_calls")
+            # A revalidated response was answered 304, its body came from the cache
+            if getattr(response, "from_cache", False):
+                self.count(f"{prefix}_not_modified")
+            else:
+                self.count(f"{prefix}_bytes", len(response.content))
+            self.count(f"{prefix}_seconds", response.elapsed.total_seconds())
+            if response.status_code >= 400:
+                self.count(f"{prefix}_errors")
+
+        self._sessions.append(session)
+        session.hooks["response"].append(observe)
+
+    def _record(self, name, started, seconds, args):
+        with self._lock:
+            self.spans.append((name, started - self.started, seconds, threading.get_ident(), args))
+
+    def report(self):
+        """
+        Returns:
+            dict: Total run time, per stage calls and wall time, and counters.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+
+        stages = {}
+        for name, _, seconds, _, _ in spans:
+            stage = stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 3)
+            stage["max_seconds"] = round(stage["max_seconds"], 3)
+
+        return {
+            "run_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "counters": {k: round(v, 3) if isinstance(v, float) else v for k, v in counters.items()},
+        }
+
+    def text_report(self, report=None):
+        report = report or self.report()
+        lines = [f"Run took {report['run_seconds']:.1f}s", f"{'stage':<28} {'calls':>8} {'total':>10} {'max':>9}"]
+        for name, stage in sorted(report["stages"].items(), key=lambda x: -x[1]["seconds"]):
+            lines.append(f"{name:<28} {stage['calls']:>8} {stage['seconds']:>9.2f}s {stage['max_seconds']:>8.2f}s")
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"{name:<28} {value:>8}")
+        return "\n".join(lines)
+
+    def chrome_events(self):
+        """
+        Returns:
+            list: Every span as a Chrome trace complete event, in microseconds.
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        pid = os.getpid()
+        return [
+            {"name": name, "ph": "X", "ts": round(started * 1e6), "dur": round(seconds * 1e6), "pid": pid, "tid": tid, "args": args}
+            for name, started, seconds, tid, args in spans]
+
+    def save(self):
+        if not self.enabled:
+            return
+
+        report = self.report()
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        if self.chrome_trace:
+            trace_path = os.path.splitext(self.path)[0] + ".trace.json"
+            with open(trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f)
+
+        print("")
+        print(self.text_report(report))
+        print(f"Profile saved as {self.path}")
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.started, time.perf_counter() - self.started, self.args)
+
+
+# Shared by every module, so one run's stages end up in one profile
+tracer = Tracer()
@@ -4,33 +4,132 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 import getpass
+import json
+import requests
+import threading
 import time
 import os
 
+# Canvas instance logged in to when no other is given
+CANVAS_LOGIN_URL = 'https://canvas.liverpool.ac.uk'
+
+# Where the login cookies are kept between runs
+SESSION_CACHE_PATH = os.path.join(".cache", "canvas_session.json")
+
+
+def save_session_cookies(cookies, path):
+    # The cookies are as good as a password, so only the owner can read them
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, mode=0o700)
+
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.time(), "cookies": cookies}, f)
+    os.replace(tmp_path, path)
+
+
+def load_session_cookies(path):
+    """
+    Returns:
+        list: The saved cookies that haven't expired, or None if there are none.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            cookies = json.load(f)["cookies"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    now = time.time()
+    cookies = [x for x in cookies if x.get("expiry") is None or x["expiry"] > now]
+    return cookies or None
+
+
+def session_is_valid(cookies, base_url, timeout=10):
+    """
+    Checks the cookies are still logged in to the Canvas at base_url, with one API request and no browser.
+    """
+    base_url = base_url.rstrip("/")
+    http = requests.Session()
+    for cookie in cookies:
+        http.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+
+    try:
+        # An expired login is redirected to the sign in page or refused
+        response = http.get(f"{base_url}/api/v1/users/self", allow_redirects=False, timeout=timeout)
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+    finally:
+        http.close()
+
+
+def saved_session(path, base_url):
+    """
+    Returns:
+        list: The cookies saved at path if they are still logged in to the Canvas at base_url, otherwise None.
+    """
+    cookies = load_session_cookies(path)
+    if cookies is None:
+        return None
+
+    if not session_is_valid(cookies, base_url):
+        print("The saved Canvas login has expired, please log in again.")
+        return None
+
+    return cookies
+
+
+def create_canvas_browser():
+    # Get the current directory
+    current_dir = os.getcwd()
+
+    # Append the file name to the current directory
+    CHROMEDRIVER_PATH = os.path.join(current_dir, 'chromedriver.exe')
+
+    service = Service(executable_path=CHROMEDRIVER_PATH)
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--log-level=3')
+    chrome_options.add_argument('--ignore-certificate-errors')
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
 class CanvasSession:
-    def __init__(self):
+    """
+    A browser logged in to Canvas.
+
+    Pass cookies to share another session's login, e.g. one returned by
+    saved_session(). Without them you are asked to log in, and with cache_path
+    the new login is saved there for later runs. base_url is the Canvas the
+    login is for, CANVAS_URL in config.py.
+    """
+
+    def __init__(self, cookies=None, cache_path=None, base_url=CANVAS_LOGIN_URL):
+        # A single browser can only load one page at a time
+        self.lock = threading.Lock()
+        self.base_url = base_url.rstrip("/")
+
+        # Configure webdriver
+        self.browser = create_canvas_browser()
+
+        if cookies is None:
+            self.login()
+            if cache_path is not None:
+                cookies = self.get_cookies()
+                if session_is_valid(cookies, self.base_url):
+                    save_session_cookies(cookies, cache_path)
+        else:
+            self.load_cookies(cookies)
+
+    def login(self):
         # Get username and password from user
         self.username = input("Input your MWS email address: ")
         self.password = getpass.getpass("Input your MWS password: ")
-        
-        # Configure webdriver
-        
-        # Get the current directory
-        current_dir = os.getcwd()
-
-        # Append the file name to the current directory
-        CHROMEDRIVER_PATH = os.path.join(current_dir, 'chromedriver.exe')
-        
 
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--log-level=3')
-        chrome_options.add_argument('--ignore-certificate-errors')
-        self.browser = webdriver.Chrome(service=service, options=chrome_options)
-        
         # Login
-        self.browser.get('https://canvas.liverpool.ac.uk')
+        self.browser.get(self.base_url)
         
         username_input = self.browser.find_element(By.XPATH, "//input[@name='UserName']")
         password_input = self.browser.find_element(By.XPATH, "//input[@name='Password']")
@@ -69,6 +168,21 @@ class CanvasSession:
             print("")
             print("Login Failure")
 
+    def get_cookies(self):
+        # Make sure the cookies come from the Canvas domain, not the SSO pages
+        if not self.browser.current_url.startswith(self.base_url):
+            self.browser.get(self.base_url)
+        return self.browser.get_cookies()
+
+    def load_cookies(self, cookies):
+        # Cookies can only be set for the domain the browser is on
+        self.browser.get(self.base_url)
+        for cookie in cookies:
+            self.browser.add_cookie(cookie)
+
+    def close(self):
+        self.browser.quit()
+
 
 class CMSession:
     def __init__(self):